@@ -0,0 +1,156 @@
+# Backend/backfill.py
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+logger = logging.getLogger("uvicorn")
+
+
+class BackfillJob:
+    """
+    A long-running import executed as a background task, with progress and pause/resume.
+
+    The import reports through `begin` (records already done, e.g. from a checkpoint, and the
+    size of the file), `read` (bytes of the file read so far) and `advance` (after each
+    committed chunk), and calls `wait_while_paused` between chunks, so a pause takes effect
+    once the chunk in flight is committed.
+
+    The file is never counted up front: while the import runs, the total is estimated from the
+    records done per byte read and refines itself as it goes; it is exact once the run is done.
+    The ETA extrapolates the rate of this run: records done since `begin`, over the time
+    spent running (pauses excluded).
+    """
+
+    def __init__(self) -> None:
+        self.phase = "idle"  # idle -> starting -> running -> done | interrupted | partial | failed
+        self.total: int | None = None
+        self.done = 0
+        self.stored = 0
+        self.bytes_total = 0
+        self.bytes_read = 0
+        self.result: dict[str, Any] | None = None
+        self.error: str | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._started_at: float | None = None
+        self._done_at_start = 0
+        self._paused_seconds = 0.0
+        self._paused_since: float | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def paused(self) -> bool:
+        return not self._resumed.is_set()
+
+    def start(self, run: Callable[["BackfillJob"], Awaitable[dict[str, Any]]]) -> bool:
+        """Run `run(self)` in the background; False if a run is already going."""
+        if self.running:
+            return False
+        self.phase, self.total, self.done, self.stored = "starting", None, 0, 0
+        self.bytes_total = self.bytes_read = 0
+        self.result = self.error = None
+        self._started_at, self._paused_seconds = None, 0.0
+        self._paused_since = None
+        self._resumed.set()
+        self._task = asyncio.get_running_loop().create_task(self._run(run))
+        return True
+
+    async def _run(self, run: Callable[["BackfillJob"], Awaitable[dict[str, Any]]]) -> None:
+        try:
+            self.result = await run(self)
+            status = str(self.result.get("status"))
+            self.phase = "done" if status in ("imported", "unchanged") else status
+            if self.phase == "done":
+                self.total = self.done
+        except asyncio.CancelledError:
+            self.phase = "interrupted"
+            raise
+        except Exception as e:
+            self.phase, self.error = "failed", str(e)
+            logger.exception("❌ Backfill failed")
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def pause(self) -> bool:
+        if not self.running or self.paused:
+            return False
+        self._resumed.clear()
+        self._paused_since = time.monotonic()
+        return True
+
+    def resume(self) -> bool:
+        if not self.paused:
+            return False
+        if self._paused_since is not None:
+            self._paused_seconds += time.monotonic() - self._paused_since
+            self._paused_since = None
+        self._resumed.set()
+        return True
+
+    async def wait_while_paused(self) -> None:
+        await self._resumed.wait()
+
+    def begin(self, done: int, stored: int, bytes_total: int = 0) -> None:
+        """The import starts after `done` records (more than 0 when resuming a checkpoint)."""
+        self.phase = "running"
+        self.done = self._done_at_start = done
+        self.stored = stored
+        self.bytes_total, self.bytes_read = bytes_total, 0
+        self._started_at = time.monotonic()
+        self._paused_seconds = 0.0
+        if self._paused_since is not None:
+            self._paused_since = self._started_at  # paused before the import got going
+
+    def read(self, bytes_read: int) -> None:
+        self.bytes_read = bytes_read
+
+    def advance(self, done: int, stored: int) -> None:
+        self.done, self.stored = done, stored
+
+    def estimated_total(self) -> int | None:
+        """Exact total when known, else done records scaled by the share of the file read."""
+        if self.total is not None:
+            return self.total
+        if not self.done or not self.bytes_read or not self.bytes_total:
+            return None
+        # The reader runs up to one read ahead of `done`, so this errs low until the end
+        share_read = min(self.bytes_read, self.bytes_total) / self.bytes_total
+        return max(self.done, round(self.done / share_read))
+
+    def _active_seconds(self) -> float:
+        if self._started_at is None:
+            return 0.0
+        paused = self._paused_seconds
+        if self._paused_since is not None:
+            paused += time.monotonic() - self._paused_since
+        return max(time.monotonic() - self._started_at - paused, 0.0)
+
+    def progress(self) -> dict[str, Any]:
+        active = self._active_seconds()
+        rate = (self.done - self._done_at_start) / active if active > 0 else 0.0
+        total = self.estimated_total()
+        eta = None
+        if self.running and total is not None and rate > 0:
+            eta = max(total - self.done, 0) / rate
+        return {
+            "state": "paused" if self.running and self.paused else self.phase,
+            "total": total,
+            "total_is_estimate": self.total is None and total is not None,
+            "done": self.done,
+            "stored": self.stored,
+            "percent": round(100 * self.done / total, 1) if total else None,
+            "records_per_second": round(rate, 2),
+            "eta_seconds": round(eta) if eta is not None else None,
+            "active_seconds": round(active, 1),
+            "result": self.result,
+            "error": self.error,
+        }
@@ -0,0 +1,149 @@
+# Backend/batcher.py
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any
+
+logger = logging.getLogger("uvicorn")
+
+BatchHandler = Callable[[list[Any]], Awaitable[None]]
+
+
+class BatchScheduler:
+    """
+    Collects submitted items on the running event loop and hands them to `handler` in batches.
+
+    A batch is flushed as soon as `max_batch_size` items are waiting, or once the oldest
+    waiting item has been queued for `max_wait` seconds — whichever comes first.
+    Up to `max_in_flight` batches are processed concurrently.
+    """
+
+    def __init__(
+        self,
+        handler: BatchHandler,
+        max_batch_size: int = 100,
+        max_wait: float = 10.0,
+        max_in_flight: int = 4,
+    ) -> None:
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_in_flight = max_in_flight
+
+        self._pending: deque[tuple[float, Any]] = deque()  # (enqueued at, item), oldest first
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight: set[asyncio.Task[None]] = set()
+        self._runner: asyncio.Task[None] | None = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def submit(self, item: object) -> int:
+        """Queue a single item. Returns the number of items waiting to be batched."""
+        return self.submit_many((item,))
+
+    def submit_many(self, items: Iterable[Any]) -> int:
+        """Queue several items at once. Returns the number of items waiting to be batched."""
+        before = len(self._pending)
+        now = time.monotonic()
+        self._pending.extend((now, item) for item in items)
+        if len(self._pending) != before:
+            self._wakeup.set()
+        return len(self._pending)
+
+    def start(self) -> None:
+        """Start the scheduling loop on the current event loop."""
+        if self._runner is None or self._runner.done():
+            self._stopping = False
+            self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0, drain: bool = False) -> None:
+        """
+        Stop scheduling and wait up to `timeout` seconds for in-flight batches.
+
+        With `drain=True` the items still waiting are flushed immediately as well, as far as
+        the same time budget allows. Batches that don't finish in time are cancelled and their
+        items are left to the caller (e.g. replayed from a write-ahead log on next start).
+        """
+        deadline = time.monotonic() + timeout
+        self._stopping = True
+        self._wakeup.set()
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+        while drain and self._pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=remaining)
+            except TimeoutError:
+                break
+            self._dispatch_next()
+        if self._in_flight:
+            remaining = max(deadline - time.monotonic(), 0)
+            _, still_running = await asyncio.wait(self._in_flight, timeout=remaining)
+            for task in still_running:
+                task.cancel()
+
+    def _take_batch(self) -> list[Any]:
+        size = min(self.max_batch_size, len(self._pending))
+        # Leftovers keep their own enqueue times, so their deadline doesn't move
+        return [self._pending.popleft()[1] for _ in range(size)]
+
+    async def _wait_until_due(self) -> None:
+        """Sleep until the pending buffer is full or its deadline passes."""
+        while not self._stopping:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if len(self._pending) >= self.max_batch_size:
+                return
+            oldest_at = self._pending[0][0]
+            remaining = oldest_at + self.max_wait - time.monotonic()
+            if remaining <= 0:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+            except TimeoutError:
+                return
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            await self._wait_until_due()
+            if self._stopping or not self._pending:
+                continue
+            await self._slots.acquire()
+            self._dispatch_next()
+
+    def _dispatch_next(self) -> None:
+        """Start the next batch; the caller must already hold an in-flight slot."""
+        batch = self._take_batch()
+        if not batch:
+            self._slots.release()
+            return
+        task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: list[Any]) -> None:
+        try:
+            logger.info(f"🧠 Processing new batch of size {len(batch)}")
+            await self.handler(batch)
+        except Exception as e:
+            logger.info(f"❌ Error while processing batch: {e}")
+        finally:
+            self._slots.release()
@@ -0,0 +1,98 @@
+# Backend/category_index.py
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+
+
+class _CategoryEntries:
+    __slots__ = ("ids", "queries")
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.queries: list[str] = []
+
+
+class CategoryIndex:
+    """
+    Stored search events per category, in ascending id order, as compact parallel columns.
+
+    Ids are kept in `array('q')` (8 bytes each) next to a list of interned query strings, so
+    a repeated query is held once however often it was searched, and there is no per-event
+    object at all. Position i of a category maps to its event in O(1) (random sampling) and
+    a page after a given id is a bisect plus a slice (sequential paging).
+
+    New ids are usually larger than everything already indexed and are appended. Writes that
+    commit concurrently (live batches, a running import) can reach the index out of id order,
+    though; such an id is inserted at its sorted position, and an id already present is ignored.
+    Writers and the readers in the threadpool share one lock, so a reader never sees `ids` and
+    `queries` out of step.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, _CategoryEntries] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries.ids) for entries in self._entries.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def add(self, category: str, event_id: int, query: str) -> None:
+        with self._lock:
+            self._add(category, event_id, query)
+
+    def extend(self, rows: Iterable[tuple[str, int, str]]) -> None:
+        """Add (category, id, query) rows; ascending id order is the fast path, not required."""
+        with self._lock:
+            for category, event_id, query in rows:
+                self._add(category, event_id, query)
+
+    def _add(self, category: str, event_id: int, query: str) -> None:
+        entries = self._entries.get(category)
+        if entries is None:
+            entries = self._entries[category] = _CategoryEntries()
+        ids = entries.ids
+        if not ids or event_id > ids[-1]:
+            ids.append(event_id)
+            entries.queries.append(sys.intern(query))
+            return
+        position = bisect_left(ids, event_id)
+        if ids[position] == event_id:
+            return  # already indexed
+        ids.insert(position, event_id)
+        entries.queries.insert(position, sys.intern(query))
+
+    def size(self, category: str) -> int:
+        with self._lock:
+            entries = self._entries.get(category)
+            return len(entries.ids) if entries is not None else 0
+
+    def last_id(self, category: str) -> int | None:
+        with self._lock:
+            entries = self._entries.get(category)
+            return entries.ids[-1] if entries is not None and entries.ids else None
+
+    def entry_at(self, category: str, position: int) -> tuple[int, str]:
+        with self._lock:
+            entries = self._entries[category]
+            return entries.ids[position], entries.queries[position]
+
+    def page_after(self, category: str, after_id: int, limit: int) -> list[tuple[int, str]]:
+        """Up to `limit` (id, query) pairs with id > after_id, in id order."""
+        with self._lock:
+            entries = self._entries.get(category)
+            if entries is None:
+                return []
+            ids = entries.ids
+            start = bisect_right(ids, after_id)
+            stop = min(start + limit, len(ids))
+            return list(zip(ids[start:stop], entries.queries[start:stop], strict=True))
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            return {category: len(entries.ids) for category, entries in self._entries.items()}
@@ -1,33 +1,122 @@
 # Backend/utils/google_snapshot.py
-from playwright.async_api import async_playwright
-import base64
 import asyncio
+import logging
+import os
+from urllib.parse import quote_plus
 
-async def fetch_google_snapshot(query: str) -> dict[str, str]:
-    """Fetch Google Search result snapshot and rendered HTML for a given query."""
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(viewport={"width": 1280, "height": 800})
-        page = await context.new_page()
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    FloatRect,
+    Page,
+    Playwright,
+    ViewportSize,
+    async_playwright,
+)
 
-        url = f"https://www.google.com/search?q={query}"
-        await page.goto(url, timeout=45000)
-        await page.wait_for_timeout(2500)  # let results settle
+logger = logging.getLogger("uvicorn")
 
-        # Screenshot → base64 string
-        screenshot_bytes = await page.screenshot(full_page=True)
-        screenshot_b64 = base64.b64encode(screenshot_bytes).decode("utf-8")
+SEARCH_URL = "https://www.google.com/search?q={}"
+VIEWPORT: ViewportSize = {"width": 1280, "height": 800}
+PAGE_LOAD_TIMEOUT_MS = 45000
+SETTLE_MS = 2500  # let results settle
+THUMBNAIL_QUALITY = 60  # JPEG quality of the above-the-fold thumbnail
 
-        # Rendered HTML (includes dynamically injected content)
-        html = await page.content()
 
-        await browser.close()
+class BrowserPool:
+    """
+    One long-lived headless Chromium shared by all snapshot requests.
 
-        return {
-            "query": query,
-            "snapshot": f"data:image/png;base64,{screenshot_b64}",
-            "html": html
-        }
+    At most `size` pages render at once (default: CPU count); further requests wait for a
+    slot. Pages are reused across requests and replaced after `max_uses_per_page` renders
+    or after a failed one, and the browser is relaunched if it dies.
+    """
+
+    def __init__(self, size: int | None = None, max_uses_per_page: int = 50) -> None:
+        self.size = size or os.cpu_count() or 1
+        self.max_uses_per_page = max_uses_per_page
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+        self._context: BrowserContext | None = None
+        self._idle: list[tuple[Page, int]] = []
+        self._slots = asyncio.Semaphore(self.size)
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self) -> None:
+        """Launch the browser if it isn't running yet (or any more)."""
+        async with self._start_lock:
+            if self.running:
+                return
+            await self._close()
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._context = await self._browser.new_context(viewport=VIEWPORT)
+            logger.info(f"✅ Snapshot browser started with {self.size} render slots")
+
+    async def stop(self) -> None:
+        async with self._start_lock:
+            await self._close()
+
+    async def _close(self) -> None:
+        self._idle.clear()  # pages go away with their context
+        for closer in (self._context, self._browser):
+            if closer is not None:
+                try:
+                    await closer.close()
+                except Exception:
+                    pass  # already gone, e.g. the browser crashed
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._playwright = self._browser = self._context = None
+
+    async def _acquire_page(self) -> tuple[Page, int]:
+        while self._idle:
+            page, uses = self._idle.pop()
+            if not page.is_closed():
+                return page, uses
+        assert self._context is not None
+        return await self._context.new_page(), 0
+
+    async def _release_page(self, page: Page, uses: int, healthy: bool) -> None:
+        if healthy and uses < self.max_uses_per_page and not page.is_closed():
+            self._idle.append((page, uses))
+            return
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    async def render(self, query: str) -> tuple[bytes, bytes, str]:
+        """
+        Render the Google results page for a query.
+        Returns (full-page PNG, JPEG thumbnail of the first viewport, rendered HTML).
+        """
+        async with self._slots:
+            await self.start()
+            page, uses = await self._acquire_page()
+            healthy = False
+            try:
+                await page.goto(SEARCH_URL.format(quote_plus(query)), timeout=PAGE_LOAD_TIMEOUT_MS)
+                await page.wait_for_timeout(SETTLE_MS)
+                screenshot_bytes = await page.screenshot(full_page=True)
+                thumbnail_bytes = await page.screenshot(
+                    type="jpeg",
+                    quality=THUMBNAIL_QUALITY,
+                    clip=FloatRect(x=0, y=0, width=VIEWPORT["width"], height=VIEWPORT["height"]),
+                )
+                # Rendered HTML (includes dynamically injected content)
+                html = await page.content()
+                healthy = True
+            finally:
+                await self._release_page(page, uses + 1, healthy)
+        return screenshot_bytes, thumbnail_bytes, html
+
+
+browser_pool = BrowserPool()
 
 # Test with:
-# asyncio.run(fetch_google_snapshot("Elon Musk Twitter acquisition"))
+# asyncio.run(browser_pool.render("Elon Musk Twitter acquisition"))
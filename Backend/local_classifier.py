@@ -0,0 +1,132 @@
+# Backend/local_classifier.py
+import math
+import re
+import threading
+import zlib
+from collections.abc import Iterable, Sequence
+from itertools import pairwise
+
+import numpy as np
+
+from Backend.query_normalization import normalize_query
+
+_TOKEN = re.compile(r"\w+")
+
+
+def hashed_features(query: str, n_features: int) -> np.ndarray:
+    """
+    Bucket indices for a query: word unigrams, word bigrams and character trigrams
+    (with word boundaries), hashed with crc32 so they are stable across processes.
+    """
+    text = normalize_query(query)
+    words = _TOKEN.findall(text)
+    grams: list[str] = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in pairwise(words)]
+    for w in words:
+        padded = f"<{w}>"
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) % n_features for g in grams),
+        dtype=np.int64,
+        count=len(grams),
+    )
+
+
+class HashedNaiveBayes:
+    """
+    Multinomial naive Bayes over hashed n-gram features, trainable incrementally.
+
+    Counts live in a dense (n_classes, n_features) matrix next to the matching
+    log-probabilities, so predicting one query is a column gather plus a row sum. Training
+    only marks the classes it touched; `refresh` recomputes just those rows (call it from a
+    worker thread after training, or it runs on the next prediction). Training and refresh
+    are serialized by a lock; predictions read without one.
+    """
+
+    def __init__(
+        self,
+        categories: Sequence[str],
+        n_features: int = 2**18,
+        alpha: float = 0.1,
+        min_coverage: float = 0.5,
+    ) -> None:
+        self.categories = list(categories)
+        self._index = {c: i for i, c in enumerate(self.categories)}
+        self.n_features = n_features
+        self.alpha = alpha
+        self.min_coverage = min_coverage
+        self.feature_counts = np.zeros((len(self.categories), n_features), dtype=np.float32)
+        self.class_counts = np.zeros(len(self.categories), dtype=np.float64)
+        self._row_totals = np.zeros(len(self.categories), dtype=np.float64)  # feature count sums
+        # Untrained rows are uniform: log(alpha / (alpha * n_features))
+        self._log_likelihood = np.full(
+            (len(self.categories), n_features), -math.log(n_features), dtype=np.float32
+        )
+        self._log_prior = self._compute_log_prior()
+        self._seen = np.zeros(n_features, dtype=bool)
+        self._dirty: set[int] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def n_samples(self) -> int:
+        return int(self.class_counts.sum())
+
+    def partial_fit(self, samples: Iterable[tuple[str, str]]) -> int:
+        """Add (query, category) samples; unknown categories are ignored. Returns samples used."""
+        used = 0
+        with self._lock:
+            for query, category in samples:
+                row = self._index.get(category)
+                if row is None:
+                    continue
+                features = hashed_features(query, self.n_features)
+                if features.size == 0:
+                    continue
+                np.add.at(self.feature_counts[row], features, 1.0)
+                self._row_totals[row] += features.size
+                self.class_counts[row] += 1
+                self._seen[features] = True
+                self._dirty.add(row)
+                used += 1
+        return used
+
+    def _compute_log_prior(self) -> np.ndarray:
+        log_prior: np.ndarray = np.log(
+            (self.class_counts + 1.0) / (self.class_counts.sum() + len(self.categories))
+        )
+        return log_prior
+
+    def refresh(self) -> None:
+        """Recompute the log-probabilities of the classes trained since the last refresh."""
+        with self._lock:
+            for row in self._dirty:
+                total = self._row_totals[row] + self.alpha * self.n_features
+                log_counts = np.log(self.feature_counts[row] + self.alpha)
+                self._log_likelihood[row] = log_counts - math.log(total)
+            self._dirty.clear()
+            self._log_prior = self._compute_log_prior()
+
+    def predict(self, query: str) -> tuple[str | None, float]:
+        """
+        Return (category, confidence) for a query; (None, 0.0) if there is nothing to go on.
+
+        Only features seen during training are scored. Unseen ones carry no evidence but
+        would skew the result towards sparsely trained classes, so the model abstains when
+        fewer than `min_coverage` of the query's features are known.
+        """
+        if self.n_samples == 0:
+            return None, 0.0
+        features = hashed_features(query, self.n_features)
+        if features.size == 0:
+            return None, 0.0
+        if self._dirty:
+            self.refresh()
+        known = features[self._seen[features]]
+        if known.size < self.min_coverage * features.size:
+            return None, 0.0
+        features = known
+        scores = self._log_prior + self._log_likelihood[:, features].sum(axis=1)
+        best = int(np.argmax(scores))
+        # softmax probability of the winning class
+        confidence = 1.0 / float(np.exp(scores - scores[best]).sum())
+        return self.categories[best], confidence if math.isfinite(confidence) else 0.0
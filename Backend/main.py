@@ -1,42 +1,54 @@
 # # backend/main.py
-from fastapi import FastAPI, UploadFile, File
-from sqlmodel import SQLModel, Field, Session, create_engine, select
-from typing import Optional ,Any
-from datetime import datetime, timedelta
+import asyncio
+import base64
+import codecs
+import hashlib
 import json
+import logging
 import os
-from dotenv import load_dotenv
-
-import subprocess
-from pathlib import Path
-
-from threading import Thread,Event
-import time
-from collections import deque
-from pydantic import BaseModel
-from fastapi import Query
-import hashlib
+import random
 import socket
-import asyncio
 import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from datetime import UTC, datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from fastapi.middleware.cors import CORSMiddleware
-import random
-
-from InferenceManager.runInferenceInBatches import run_batch_inference_concurrently
-
-from Backend.processMyActivity import extract_queries
-
-from Backend.google_snapshot import fetch_google_snapshot
 import uvicorn
-
-import logging
-
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Index, and_, case, delete, insert, inspect, literal, or_, text, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.schema import CreateColumn
+from sqlmodel import Field, Session, SQLModel, create_engine, func, select
+
+from Backend.backfill import BackfillJob
+from Backend.batcher import BatchScheduler
+from Backend.category_index import CategoryIndex
+from Backend.google_snapshot import browser_pool
+from Backend.local_classifier import HashedNaiveBayes
+from Backend.pending_store import PendingEventStore
+from Backend.prefetcher import SnapshotPrefetcher
+from Backend.processMyActivity import iter_search_records
+from Backend.query_normalization import normalize_query
+from Backend.query_rules import QueryRuleEngine
+from Backend.sampling import IndexPermutation
+from Backend.snapshot_cache import CachedSnapshot, SnapshotCache
+from Backend.streaming_json import JSONStreamDecoder, JSONStreamError, MalformedItem
+from InferenceManager.runInferenceInBatches import DEFAULT_PROMPT_FILE, classify_items
 
 logger = logging.getLogger("uvicorn")
 
-def print(*args, **kwargs):
-    """Redirect print() to Uvicorn’s logger"""
+def print(*args: object, **kwargs: object) -> None:  # noqa: ARG001
+    """Redirect print() to Uvicorn's logger"""
     msg = " ".join(map(str, args))
     logger.info(msg)
 
@@ -45,10 +57,10 @@ def print(*args, **kwargs):
 load_dotenv()
     
 MYACTIVITY_JSON_FILE = os.getenv("MYACTIVITY_JSON_FILE","")
+PROMPT_FILE = DEFAULT_PROMPT_FILE
 
-stop_event = Event()  # 👈 shared flag to stop worker loop
-worker_thread = Thread()
 DATABASE_URL: str = ""
+SQL_ECHO = os.getenv("SQL_ECHO", "").lower() in ("1", "true", "yes")  # log every SQL statement
 engine: Any = None
 
 
@@ -70,12 +82,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # ---------- MODELS ----------
 
-class Device(SQLModel, table=True):  # type: ignore[misc]
-    id: Optional[int] = Field(default=None, primary_key=True)
+class Device(SQLModel, table=True):  # type: ignore[misc, unused-ignore]
+    id: int | None = Field(default=None, primary_key=True)
 
     # Auto-detected from extension (Option A)
     fingerprint: str  # UUID generated and persisted by extension
@@ -88,163 +101,830 @@ class Device(SQLModel, table=True):  # type: ignore[misc]
 
     # Metadata
     created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
-    last_seen: Optional[str] = None  # updated whenever a query comes in
+    last_seen: str | None = None  # updated whenever a query comes in
 
 
-class SearchEvent(SQLModel, table=True):  # type: ignore[misc]
-    id: Optional[int] = Field(default=None, primary_key=True)
+class SearchEvent(SQLModel, table=True):  # type: ignore[misc, unused-ignore]
+    __table_args__ = (
+        # Covers period filters + GROUP BY category without touching the table
+        Index("ix_searchevent_timestamp_category", "timestamp", "category"),
+        # Duplicate check when re-importing Takeout exports
+        Index("ix_searchevent_timestamp_query", "timestamp", "query"),
+    )
+    id: int | None = Field(default=None, primary_key=True)
     query: str
     timestamp: datetime
-    category: Optional[str] = None  # to be filled by inference
-    device_id: Optional[int] = Field(default=None, foreign_key="device.id")
-
-
-
-# ---- Queue and worker ----
-queue = deque()
-MIN_BATCH_SIZE = 100
-MAX_WAIT_TIME = 10  # seconds
-
-def inference_worker(stop_event: Event):
-    """Continuously checks queue and processes batches."""
-    while not stop_event.is_set():
-        if len(queue) >= MIN_BATCH_SIZE:
-            batch = [queue.popleft() for _ in range(MIN_BATCH_SIZE)]
-            print(f"🧠 Processing new batch of size {len(batch)}")
-            try:
-                # if process_batch is async, run it in the event loop thread
-                asyncio.run(process_batch(batch))
-            except Exception as e:
-                print(f"❌ Error while processing batch: {e}")
+    category: str | None = Field(default=None, index=True)  # to be filled by inference
+    device_id: int | None = Field(default=None, foreign_key="device.id")
+
+
+class CategoryRollup(SQLModel, table=True):  # type: ignore[misc, unused-ignore]
+    """Pre-aggregated SearchEvent counts per (time bucket, category, device)."""
+    granularity: str = Field(primary_key=True)     # "hour" | "day"
+    bucket_start: datetime = Field(primary_key=True)
+    category: str = Field(primary_key=True)        # "uncategorized" when the event has none
+    device_id: int = Field(primary_key=True)       # 0 when the event has no device
+    count: int = 0
+
+
+class QueryClassification(SQLModel, table=True):  # type: ignore[misc, unused-ignore]
+    """Category previously assigned to a normalized query, reused instead of asking the LLM."""
+    normalized_query: str = Field(primary_key=True)
+    category: str
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    source: str | None = None  # "llm" | "rule" | "local"; None if cached before this was tracked
+
+
+class ImportSource(SQLModel, table=True):  # type: ignore[misc, unused-ignore]
+    """How far a Takeout source has been imported, so re-imports only process newer entries."""
+    source: str = Field(primary_key=True)
+    high_water: datetime | None = None   # newest entry timestamp imported (naive UTC)
+    content_hash: str | None = None      # sha256 of the file last imported completely
+    imported: int = 0                       # events stored from this source so far
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ImportProgress(SQLModel, table=True):  # type: ignore[misc, unused-ignore]
+    """Checkpoint of an import in progress, committed with each chunk; removed once it completes."""
+    source: str = Field(primary_key=True)
+    content_hash: str                       # file being imported
+    records_done: int = 0                   # Takeout records consumed, in file order
+    stored: int = 0                         # events stored by this import so far
+    newest: datetime | None = None       # newest timestamp seen so far (naive UTC)
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+
+# ---- Queue and batch scheduler ----
+MAX_BATCH_SIZE = 100
+MAX_WAIT_TIME = 10  # seconds an event may wait before a partial batch is flushed
+MAX_IN_FLIGHT_BATCHES = 4
+SHUTDOWN_DRAIN_TIMEOUT = 10  # seconds spent classifying queued events on shutdown
+MAX_CLASSIFY_ATTEMPTS = 5    # failed classifications before an event is dead-lettered
+RETRY_BASE_DELAY = 30        # seconds before the first retry; doubles with every attempt
+RETRY_MAX_DELAY = 15 * 60
+
+scheduler: BatchScheduler | None = None
+pending_store: PendingEventStore | None = None
+
+# ---- Rollups ----
+ROLLUP_GRANULARITIES = ("hour", "day")
+
+def _bucket_start(ts: datetime, granularity: str) -> datetime:
+    # SQLite stores timestamps without tzinfo, so bucket on the same naive wall-clock fields
+    ts = ts.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if granularity == "day" else ts
+
+def _update_rollups(session: Session, events: list[dict[str, Any]]) -> None:
+    """Add newly stored event rows to the rollup counts, inside the caller's transaction."""
+    counts: dict[tuple[str, datetime, str, int], int] = {}
+    for ev in events:
+        for granularity in ROLLUP_GRANULARITIES:
+            key = (
+                granularity,
+                _bucket_start(ev["timestamp"], granularity),
+                ev["category"] or "uncategorized",
+                ev["device_id"] or 0,
+            )
+            counts[key] = counts.get(key, 0) + 1
+    if not counts:
+        return
+    stmt = sqlite_insert(CategoryRollup).values([
+        {"granularity": g, "bucket_start": b, "category": c, "device_id": d, "count": n}
+        for (g, b, c, d), n in counts.items()
+    ])
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["granularity", "bucket_start", "category", "device_id"],
+        set_={"count": CategoryRollup.count + stmt.excluded["count"]},
+    ))
+
+def rebuild_rollups() -> int:
+    """Recompute all rollups from raw SearchEvent rows (e.g. after a bulk import); rows written."""
+    bucket_formats = {"hour": "%Y-%m-%d %H:00:00.000000", "day": "%Y-%m-%d 00:00:00.000000"}
+    with Session(engine) as session:
+        session.execute(delete(CategoryRollup))
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket = func.strftime(bucket_formats[granularity], SearchEvent.timestamp)
+            category = func.coalesce(SearchEvent.category, "uncategorized")
+            device = func.coalesce(SearchEvent.device_id, 0)
+            session.execute(
+                insert(CategoryRollup).from_select(
+                    ["granularity", "bucket_start", "category", "device_id", "count"],
+                    select(  # type: ignore[call-overload]
+                        literal(granularity), bucket, category, device, func.count()
+                    )
+                    .group_by(bucket, category, device),
+                )
+            )
+        session.commit()
+        written = session.exec(select(func.count()).select_from(CategoryRollup)).one()
+    bump_write_generation(warm=False)
+    print(f"✅ Rebuilt {written} rollup rows")
+    return written
+
+def ensure_rollups() -> None:
+    """Build rollups once for DBs that have events but predate the rollup table."""
+    with Session(engine) as session:
+        has_rollups = session.exec(select(CategoryRollup.count).limit(1)).first() is not None
+        has_events = session.exec(select(SearchEvent.id).limit(1)).first() is not None
+    if has_events and not has_rollups:
+        rebuild_rollups()
+
+def _ceil(ts: datetime, granularity: str) -> datetime:
+    start = _bucket_start(ts, granularity)
+    if start == ts:
+        return start
+    return start + (timedelta(days=1) if granularity == "day" else timedelta(hours=1))
+
+def _rollup_segments(
+    start: datetime, end: datetime | None, use_daily: bool = True
+) -> list[tuple[str | None, datetime, datetime | None]]:
+    """
+    Split [start, end) into (source, segment_start, segment_end) pieces so that every piece
+    can be answered by the coarsest data available: None for raw SearchEvent rows (partial
+    hours at the edges), "hour" for hourly rollups and "day" for daily rollups.
+    `end=None` means open-ended (up to now).
+    """
+    hour_start = _ceil(start, "hour")
+    hour_end = _bucket_start(end, "hour") if end is not None else None
+    if hour_end is not None and hour_start > hour_end:
+        return [(None, start, end)]  # within a single hour
+    if hour_end is not None and end is not None and hour_start == hour_end:
+        # no full hour, but an hour boundary inside: keep each side in its own hour
+        return [
+            (None, seg_start, seg_end)
+            for seg_start, seg_end in ((start, hour_start), (hour_end, end))
+            if seg_start < seg_end
+        ]
+    segments: list[tuple[str | None, datetime, datetime | None]] = []
+    if start < hour_start:
+        segments.append((None, start, hour_start))
+    day_start = _ceil(start, "day")
+    day_end = _bucket_start(end, "day") if end is not None else None
+    if use_daily and (day_end is None or day_start < day_end):
+        if hour_start < day_start:
+            segments.append(("hour", hour_start, day_start))
+        segments.append(("day", day_start, day_end))
+        if day_end is not None and hour_end is not None and day_end < hour_end:
+            segments.append(("hour", day_end, hour_end))
+    else:
+        segments.append(("hour", hour_start, hour_end))
+    if end is not None and hour_end is not None and hour_end < end:
+        segments.append((None, hour_end, end))
+    return segments
+
+def _segment_counts(
+    session: Session,
+    source: str | None,
+    seg_start: datetime,
+    seg_end: datetime | None,
+    by_bucket: bool,
+    device_id: int | None = None,
+) -> list[tuple[datetime, str, int]]:
+    """
+    (bucket_start, category, count) rows for one segment from _rollup_segments().
+    Without `by_bucket` all rows of the segment are summed per category and reported at
+    `seg_start`; raw segments never span more than an hour, so they are always reported that way.
+    """
+    if source is None:
+        stmt = (
+            select(SearchEvent.category, func.count())
+            .where(SearchEvent.timestamp >= seg_start)
+            .group_by(SearchEvent.category)
+        )
+        if seg_end is not None:
+            stmt = stmt.where(SearchEvent.timestamp < seg_end)
+        if device_id is not None:
+            stmt = stmt.where(SearchEvent.device_id == device_id)
+        return [(seg_start, cat or "uncategorized", int(n)) for cat, n in session.exec(stmt).all()]
+
+    columns: list[Any] = [CategoryRollup.category, func.sum(CategoryRollup.count)]
+    group_by: list[Any] = [CategoryRollup.category]
+    if by_bucket:
+        columns.insert(0, CategoryRollup.bucket_start)
+        group_by.insert(0, CategoryRollup.bucket_start)
+    stmt = (
+        select(*columns)
+        .where(CategoryRollup.granularity == source, CategoryRollup.bucket_start >= seg_start)
+        .group_by(*group_by)
+    )
+    if seg_end is not None:
+        stmt = stmt.where(CategoryRollup.bucket_start < seg_end)
+    if device_id is not None:
+        stmt = stmt.where(CategoryRollup.device_id == device_id)
+    rows = session.exec(stmt).all()
+    if by_bucket:
+        return [(bucket, cat, int(n)) for bucket, cat, n in rows]
+    return [(seg_start, cat, int(n)) for cat, n in rows]
+
+def _category_counts_since(session: Session, start_time: datetime) -> dict[str, int]:
+    """
+    Category counts for events at or after `start_time`, read mostly from rollups:
+    raw rows for the partial hour at the start, hourly rollups up to the next day
+    boundary and daily rollups from there on.
+    """
+    counts: dict[str, int] = {}
+    for source, seg_start, seg_end in _rollup_segments(start_time, None):
+        for _, cat, count in _segment_counts(session, source, seg_start, seg_end, by_bucket=False):
+            counts[cat] = counts.get(cat, 0) + count
+    return counts
+
+# ---- Classification cache ----
+CACHE_LOOKUP_CHUNK = 500  # keys per IN (...) lookup
+CLASSIFICATION_STATS: dict[str, int] = {
+    "rule_hits": 0,      # events answered by a fast-path rule
+    "cache_hits": 0,     # events answered from QueryClassification
+    "cache_misses": 0,   # events not found in the cache
+    "local_hits": 0,     # events answered confidently by the local classifier
+    "llm_items": 0,      # distinct queries actually sent to the model
+}
+
+# ---- Rule fast path ----
+QUERY_RULES_FILE = Path(__file__).parent / "query_rules.json"
+query_rules = QueryRuleEngine(QUERY_RULES_FILE)
+
+# ---- Local classifier tier ----
+LOCAL_CLASSIFIER_THRESHOLD = 0.98  # minimum softmax confidence to skip the model
+LOCAL_CLASSIFIER_MIN_SAMPLES = 500  # labels the local model must have seen before it is trusted
+TRAINING_SOURCES = ("llm", "rule")  # never the local classifier's own answers
+local_classifier: HashedNaiveBayes | None = None
+
+def train_local_classifier() -> None:
+    """Train the local classifier from the cached queries labelled by the model or a rule."""
+    global local_classifier
+    model = HashedNaiveBayes(TAXONOMY_CATEGORIES)
+    with Session(engine) as session:
+        rows = session.exec(
+            select(QueryClassification.normalized_query, QueryClassification.category)
+            .where(QueryClassification.source.in_(TRAINING_SOURCES))  # type: ignore[union-attr]
+            .execution_options(yield_per=CACHE_LOOKUP_CHUNK)
+        )
+        used = model.partial_fit(rows)
+        rows.close()
+    model.refresh()
+    local_classifier = model
+    print(f"✅ Local classifier trained on {used} labelled queries")
+
+_train_task: asyncio.Task[None] | None = None
+
+async def _train_local_classifier_in_background() -> None:
+    """Train off the event loop; until it finishes every cache miss goes to the model."""
+    try:
+        await asyncio.to_thread(train_local_classifier)
+    except Exception as e:
+        print(f"⚠️ Local classifier not trained ({e}); cache misses go to the model.")
+
+def _learn_locally(samples: list[tuple[str, str]]) -> None:
+    """Feed model answers to the local classifier; blocking, run it in a worker thread."""
+    if local_classifier is not None and samples:
+        local_classifier.partial_fit(samples)
+        local_classifier.refresh()
+
+def _lookup_cached_categories(keys: set[str]) -> dict[str, str]:
+    found: dict[str, str] = {}
+    key_list = [k for k in keys if k]
+    with Session(engine) as session:
+        for i in range(0, len(key_list), CACHE_LOOKUP_CHUNK):
+            chunk = key_list[i : i + CACHE_LOOKUP_CHUNK]
+            rows = session.exec(
+                select(QueryClassification.normalized_query, QueryClassification.category)
+                .where(QueryClassification.normalized_query.in_(chunk))  # type: ignore[attr-defined]
+            ).all()
+            found.update(rows)
+    return found
+
+def _cache_categories(session: Session, entries: list[dict[str, Any]]) -> None:
+    """
+    Upsert query -> category for classified entries, inside the caller's transaction.
+    `category_source` (see classify_events) is stored along; cache hits aren't rewritten.
+    """
+    now = datetime.utcnow()
+    rows = {
+        normalize_query(entry["query"]): (entry["category"], entry.get("category_source"))
+        for entry in entries
+        if entry.get("query") and entry.get("category") and entry.get("category_source") != "cache"
+    }
+    rows.pop("", None)
+    if not rows:
+        return
+    stmt = sqlite_insert(QueryClassification).values([
+        {"normalized_query": k, "category": category, "source": source, "updated_at": now}
+        for k, (category, source) in rows.items()
+    ])
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["normalized_query"],
+        set_={
+            "category": stmt.excluded.category,
+            "source": stmt.excluded.source,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
+
+def seed_classification_cache() -> None:
+    """Fill an empty cache from already classified SearchEvent rows (one-off for existing DBs)."""
+    with Session(engine) as session:
+        if session.exec(select(func.count()).select_from(QueryClassification)).one():
+            return
+        rows = session.exec(
+            select(SearchEvent.query, SearchEvent.category)
+            .where(SearchEvent.category.is_not(None))  # type: ignore[union-attr]
+            .execution_options(yield_per=CACHE_LOOKUP_CHUNK)
+        )
+        seeded: dict[str, str] = {}
+        for query, category in rows:
+            key = normalize_query(query)
+            if key:
+                seeded[key] = category  # type: ignore[assignment]
+        rows.close()
+        # These predate the local classifier, so every label came from the model
+        items = [{"query": k, "category": v, "category_source": "llm"} for k, v in seeded.items()]
+        for i in range(0, len(items), CACHE_LOOKUP_CHUNK):
+            _cache_categories(session, items[i : i + CACHE_LOOKUP_CHUNK])
+        session.commit()
+    if seeded:
+        print(f"✅ Seeded classification cache with {len(seeded)} queries")
+
+def _predict_locally(query: str) -> str | None:
+    if local_classifier is None or local_classifier.n_samples < LOCAL_CLASSIFIER_MIN_SAMPLES:
+        return None
+    category, confidence = local_classifier.predict(query)
+    return category if confidence >= LOCAL_CLASSIFIER_THRESHOLD else None
+
+async def classify_events(
+    events: list[dict[str, Any]], show_progress: bool = False
+) -> list[dict[str, Any]]:
+    """
+    Classify events through the cheap tiers first: fast-path rules, the query cache,
+    then the local classifier. Only what none of them can answer confidently goes to the
+    model, and repeated queries within the batch are sent once. Model answers are fed back
+    into the local classifier.
+    Returns copies of the events in input order with 'category' set (None if unanswered)
+    and 'category_source' naming the tier that answered ("rule", "cache", "local", "llm").
+    """
+    query_rules.reload_if_changed()
+    keys = [normalize_query(event.get("query") or "") for event in events]
+    rule_categories: list[str | None] = []
+    for key in keys:
+        rule = query_rules.match_normalized(key)
+        rule_categories.append(rule.category if rule else None)
+    cached = await asyncio.to_thread(
+        _lookup_cached_categories,
+        {k for k, c in zip(keys, rule_categories, strict=True) if c is None},
+    )
+
+    results: list[dict[str, Any]] = []
+    misses: dict[str, dict[str, Any]] = {}  # normalized query -> representative event
+    for event, key, rule_category in zip(events, keys, rule_categories, strict=True):
+        category = rule_category or cached.get(key)
+        source: str | None = None
+        if rule_category is not None:
+            CLASSIFICATION_STATS["rule_hits"] += 1
+            source = "rule"
+        elif category is not None:
+            CLASSIFICATION_STATS["cache_hits"] += 1
+            source = "cache"
         else:
-            time.sleep(1)  # sleep a bit
-            # Optional: if queue has items but MAX_WAIT_TIME exceeded, process anyway
-            
-    print("👋 Inference worker shutting down gracefully.")
+            CLASSIFICATION_STATS["cache_misses"] += 1
+            category = _predict_locally(event.get("query") or "")
+            if category is not None:
+                CLASSIFICATION_STATS["local_hits"] += 1
+                source = "local"
+            else:
+                misses.setdefault(key, event)
+        results.append({**event, "category": category, "category_source": source})
+
+    if misses:
+        CLASSIFICATION_STATS["llm_items"] += len(misses)
+        answered = await classify_items(
+            list(misses.values()), PROMPT_FILE, show_progress=show_progress
+        )
+        fresh = {key: entry.get("category") for key, entry in zip(misses, answered, strict=True)}
+        await asyncio.to_thread(
+            _learn_locally,
+            [(entry["query"], entry["category"]) for entry in answered if entry.get("category")],
+        )
+        for result, key in zip(results, keys, strict=True):
+            if result["category"] is None and fresh.get(key) is not None:
+                result["category"] = fresh[key]
+                result["category_source"] = "llm"
+    return results
+
+# ---- Bulk event writes ----
+EVENT_INSERT_CHUNK = 1000  # rows per executemany; SQLAlchemy sends them as multi-row INSERTs
+
+def _event_rows(
+    entries: list[dict[str, Any]], device_id: int | None = None
+) -> list[dict[str, Any]]:
+    """
+    SearchEvent rows for classified entries, skipping those without a query, a valid
+    timestamp or a category. `device_id` overrides the entries' own.
+    """
+    rows = []
+    for entry in entries:
+        query = entry.get("query")
+        category = entry.get("category")
+        timestamp = _parse_event_timestamp(entry.get("timestamp"))
+        if not query or timestamp is None or category is None:
+            continue
+        rows.append({
+            "query": query,
+            "timestamp": timestamp,
+            "category": category,
+            "device_id": device_id if device_id is not None else entry.get("device_id"),
+        })
+    return rows
+
+def _insert_search_events(
+    session: Session, rows: list[dict[str, Any]]
+) -> list[tuple[str, int, str]]:
+    """
+    Insert SearchEvent rows with core INSERT ... RETURNING, inside the caller's transaction,
+    without building ORM objects. Returns (category, id, query) per row in id order,
+    ready for category_index.extend.
+    """
+    stmt = insert(SearchEvent).returning(  # type: ignore[call-overload]
+        SearchEvent.id, SearchEvent.category, SearchEvent.query, sort_by_parameter_order=True
+    )
+    indexed: list[tuple[str, int, str]] = []
+    for i in range(0, len(rows), EVENT_INSERT_CHUNK):
+        result = session.execute(stmt, rows[i : i + EVENT_INSERT_CHUNK])
+        indexed.extend((category, event_id, query) for event_id, category, query in result)
+    indexed.sort(key=lambda row: row[1])
+    return indexed
+
+def _retry_delay(attempts: int) -> float:
+    return min(RETRY_BASE_DELAY * 2.0 ** (attempts - 1), RETRY_MAX_DELAY)
+
+async def _retry_later(pending_batch: list[tuple[int, dict[str, Any]]], error: str) -> None:
+    """Count a failed attempt for each event and resubmit it after a backoff, or dead-letter it."""
+    assert pending_store is not None
+    attempts = await asyncio.to_thread(
+        pending_store.record_failure,
+        [pid for pid, _ in pending_batch],
+        error,
+        MAX_CLASSIFY_ATTEMPTS,
+    )
+    retry: dict[int, list[tuple[int, dict[str, Any]]]] = {}
+    for item in pending_batch:
+        if item[0] in attempts:
+            retry.setdefault(attempts[item[0]], []).append(item)
+    loop = asyncio.get_running_loop()
+    for n, items in retry.items():
+        if scheduler is not None:
+            loop.call_later(_retry_delay(n), scheduler.submit_many, items)
+    given_up = len(pending_batch) - len(attempts)
+    print(
+        f"⚠️ {len(pending_batch)} events not classified ({error}); "
+        f"{len(attempts)} will be retried, {given_up} dead-lettered."
+    )
+
+async def process_batch(pending_batch: list[tuple[int, dict[str, Any]]]) -> None:
+    """Send batch to InferenceManager and update DB.
+
+    Each item is a (pending_id, event) pair; the pending rows are removed in the same
+    transaction that stores the classified events. Events that get no category are retried
+    with backoff (see _retry_later); events that can never be stored are dead-lettered.
+    """
+    invalid = {
+        pending_id for pending_id, event in pending_batch
+        if not event.get("query") or _parse_event_timestamp(event.get("timestamp")) is None
+    }
+    if invalid:
+        assert pending_store is not None
+        await asyncio.to_thread(
+            pending_store.dead_letter, list(invalid), "missing query or invalid timestamp"
+        )
+        print(f"⚠️ {len(invalid)} events with a missing query or invalid timestamp dead-lettered.")
+        pending_batch = [item for item in pending_batch if item[0] not in invalid]
+    if not pending_batch:
+        return
+    pending_ids = [pending_id for pending_id, _ in pending_batch]
+    batch = [event for _, event in pending_batch]
+
+    # Cache first, then InferenceManager for the misses
+    try:
+        classified = await classify_events(batch)
+    except Exception as e:
+        await _retry_later(pending_batch, f"classification failed: {e}")
+        return
+
+    # Only events that got a category are stored; the rest are retried
+    classified_events = [
+        (pending_id, entry)
+        for pending_id, entry in zip(pending_ids, classified, strict=True)
+        if entry.get("category") is not None
+    ]
+    unclassified = [
+        item
+        for item, entry in zip(pending_batch, classified, strict=True)
+        if entry.get("category") is None
+    ]
+    if unclassified:
+        await _retry_later(unclassified, "no category returned")
+    if not classified_events:
+        return
+
+    newEntries = _event_rows([entry for _, entry in classified_events])
+
+    def write() -> list[tuple[str, int, str]]:
+        with Session(engine) as session:
+            indexed = _insert_search_events(session, newEntries)
+            _cache_categories(session, [entry for _, entry in classified_events])
+            _update_rollups(session, newEntries)
+            PendingEventStore.mark_processed(
+                session, [pending_id for pending_id, _ in classified_events]
+            )
+            session.commit()
+        return indexed
 
-async def process_batch(batch):
-    """Send batch to InferenceManager and update DB."""
-    temp_file = Path("temp_batch.json")
-    output_file = Path("classified_temp.json")
-    
+    # In the threadpool, like import chunks, so the loop keeps serving while the batch is written
+    try:
+        indexed = await asyncio.to_thread(write)
+    except Exception as e:
+        # e.g. "database is locked"; nothing was committed, so the events are still pending
+        written = {pending_id for pending_id, _ in classified_events}
+        await _retry_later(
+            [item for item in pending_batch if item[0] in written], f"write failed: {e}"
+        )
+        return
+    category_index.extend(indexed)
+    bump_write_generation()
+    print(f"✅ Added {len(newEntries)} search events into the DB.")
+
+# ---- Takeout imports ----
+TAKEOUT_SOURCE = "takeout"
+TAKEOUT_DEVICE_ID = 1       # 🔧 placeholder, can pull from DEVICE_CACHE
+IMPORT_CHUNK = 500          # Takeout records classified and committed together
+DEDUPE_LOOKUP_CHUNK = 400   # (timestamp, query) pairs per duplicate lookup
+IMPORT_LOCK = asyncio.Lock()
+
+def _parse_event_timestamp(value: object) -> datetime | None:
+    """ISO 8601 event timestamp in the naive UTC form timestamps are stored in; None if invalid."""
+    if not isinstance(value, str) or not value:
+        return None
     try:
-        data = {"queries": batch}
-        with open(temp_file, "w") as f:
-            json.dump(data, f, indent=2)  
+        # Fast path: "...Z" (Takeout, extension) is already UTC, so no tz object round trip
+        ts = datetime.fromisoformat(value[:-1] if value[-1] == "Z" else value)
+    except ValueError:
+        return None
+    return ts.astimezone(UTC).replace(tzinfo=None) if ts.tzinfo else ts
+
+def _file_sha256(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _existing_event_keys(keys: list[tuple[datetime, str]]) -> set[tuple[datetime, str]]:
+    """Which (timestamp, query) pairs are already stored, via ix_searchevent_timestamp_query."""
+    found: set[tuple[datetime, str]] = set()
+    with Session(engine) as session:
+        for i in range(0, len(keys), DEDUPE_LOOKUP_CHUNK):
+            chunk = keys[i : i + DEDUPE_LOOKUP_CHUNK]
+            rows = session.exec(
+                select(SearchEvent.timestamp, SearchEvent.query).where(
+                    # SQLite only seeks the index for the plain IN; the row-value IN makes it exact
+                    SearchEvent.timestamp.in_({ts for ts, _ in chunk}),  # type: ignore[attr-defined]
+                    tuple_(SearchEvent.timestamp, SearchEvent.query).in_(chunk),  # type: ignore[arg-type]
+                )
+            ).all()
+            found.update((ts, query) for ts, query in rows)
+    return found
+
+async def _import_records(
+    records: list[dict[str, Any]],
+    device_id: int,
+    checkpoint: Callable[[Session, int], None] | None = None,
+) -> int:
+    """
+    Classify Takeout records ({"query", "timestamp"}) and store them in one transaction.
+    Records left without a category are not stored. `checkpoint(session, stored)` runs in
+    the same transaction, so progress is recorded exactly when the events are.
+    Returns the number stored.
+    """
+    classified_events = await classify_events(records) if records else []
 
-        # Call your InferenceManager
-        await run_batch_inference_concurrently(temp_file, output_file, "InferenceManager/prompts/system_prompt.txt")
+    def write() -> list[tuple[str, int, str]]:
+        imported = _event_rows(classified_events, device_id)
+        with Session(engine) as session:
+            indexed = _insert_search_events(session, imported)
+            _cache_categories(session, classified_events)
+            _update_rollups(session, imported)
+            if checkpoint is not None:
+                checkpoint(session, len(imported))
+            session.commit()
+        return indexed
+
+    # In the threadpool, so requests keep being served while a chunk is written
+    indexed = await asyncio.to_thread(write)
+    if indexed:
+        category_index.extend(indexed)
+        bump_write_generation()
+    return len(indexed)
+
+async def import_takeout(
+    path: str | Path,
+    source: str = TAKEOUT_SOURCE,
+    device_id: int = TAKEOUT_DEVICE_ID,
+    job: BackfillJob | None = None,
+) -> dict[str, Any]:
+    """
+    Import the "Searched for" entries of a Takeout MyActivity.json that aren't stored yet.
 
-        # Load classified results and save to DB (similar to /events/push/ logic)
-        with open(output_file, "r") as f:
-            data = json.load(f)
+    The source's high-water mark (newest timestamp imported) and the hash of the last fully
+    imported file are kept in ImportSource: an unchanged file is skipped without parsing,
+    entries older than the mark are skipped without classification, and the rest are checked
+    against stored (timestamp, query) pairs, so a newer export costs only its new entries.
 
-        classified_events = (
-            data.get("event") or
-            data.get(f"Filtered_queries", []) or
-            next(iter(data.values()), [])
-        )
+    Every IMPORT_CHUNK records are committed together with an ImportProgress checkpoint, so
+    an import of the same file that crashed, or stopped because no chunk entry could be
+    classified (API outage), resumes after the last committed chunk. The mark only moves
+    once every new entry is stored; a partly unclassified import is run again.
 
-        newEntries = []
+    With a `job`, progress is reported to it after each chunk and the import waits between
+    chunks while the job is paused.
+    """
+    if IMPORT_LOCK.locked():
+        return {"status": "busy", "source": source}
+    async with IMPORT_LOCK:
+        content_hash = await asyncio.to_thread(_file_sha256, path)
         with Session(engine) as session:
-            for entry in classified_events:
-                query = entry.get("query")
-                timestamp_str = entry.get("timestamp")
-                category = entry.get("category")
-                device_id = entry.get("device_id")
-                if not query or not timestamp_str:
-                    continue
+            mark = session.get(ImportSource, source)
+            high_water = mark.high_water if mark else None
+            if mark is not None and mark.content_hash == content_hash:
+                print(f"📂 {path} unchanged since last import of '{source}'")
+                return {"status": "unchanged", "source": source, "high_water": high_water}
+            progress = session.get(ImportProgress, source)
+            if progress is None or progress.content_hash != content_hash:
+                if progress is not None:
+                    session.delete(progress)
+                progress = ImportProgress(
+                    source=source, content_hash=content_hash, newest=high_water
+                )
+                session.add(progress)
+                session.commit()
+            records_done, newest = progress.records_done, progress.newest
+            counts = {
+                "stored": progress.stored,
+                "duplicates": 0,
+                "older": 0,
+                "invalid": 0,
+                "unclassified": 0,
+            }
 
-                timestamp = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-                ev = SearchEvent(
-                    query=query,
-                    timestamp=timestamp,
-                    device_id=device_id, 
-                    category=category
+        if job is not None:
+            job.begin(records_done, counts["stored"], bytes_total=os.path.getsize(path))
+        records = iter_search_records(path, on_read=job.read if job is not None else None)
+        if records_done:
+            print(f"♻️ Resuming import '{source}' after {records_done} records")
+            await asyncio.to_thread(lambda: next(islice(records, records_done - 1, None), None))
+
+        def checkpoint(session: Session, stored: int) -> None:
+            row = session.get(ImportProgress, source)
+            assert row is not None
+            row.records_done = records_done if not failed(stored) else records_done - len(chunk)
+            row.stored += stored
+            row.newest = newest
+            row.updated_at = datetime.utcnow()
+            session.add(row)
+
+        def failed(stored: int) -> bool:
+            # Nothing in the chunk got a category: the classifier is down, not picky
+            return stored == 0 and len(new_records) > 0
+
+        interrupted = False
+        while True:
+            if job is not None:
+                await job.wait_while_paused()
+            chunk = await asyncio.to_thread(lambda: list(islice(records, IMPORT_CHUNK)))
+            if not chunk:
+                break
+            fresh: dict[tuple[datetime, str], dict[str, Any]] = {}
+            for record in chunk:
+                ts = _parse_event_timestamp(record["timestamp"])
+                if ts is None or not record["query"]:
+                    counts["invalid"] += 1
+                    continue
+                newest = ts if newest is None or ts > newest else newest
+                if high_water is not None and ts < high_water:
+                    counts["older"] += 1
+                    continue
+                if (ts, record["query"]) in fresh:
+                    counts["duplicates"] += 1
+                    continue
+                fresh[(ts, record["query"])] = record
+            existing = await asyncio.to_thread(_existing_event_keys, list(fresh))
+            new_records = [record for key, record in fresh.items() if key not in existing]
+            counts["duplicates"] += len(fresh) - len(new_records)
+            records_done += len(chunk)
+            stored = await _import_records(new_records, device_id, checkpoint)
+            if failed(stored):
+                # Stop here; the checkpoint still points at the start of this chunk
+                interrupted = True
+                print(
+                    f"⚠️ Import '{source}' interrupted after {records_done - len(chunk)} records: "
+                    "no classifications returned"
                 )
-                session.add(ev)
-                newEntries.append(ev)
+                break
+            counts["stored"] += stored
+            counts["unclassified"] += len(new_records) - stored
+            if job is not None:
+                job.advance(records_done, counts["stored"])
+            print(
+                f"📥 Import '{source}': {records_done} records read, {counts['stored']} stored, "
+                f"{counts['duplicates']} duplicates, {counts['older']} older than mark"
+            )
+
+        if interrupted:
+            return {"status": "interrupted", "source": source, "high_water": high_water, **counts}
+        complete = counts["unclassified"] == 0
+        with Session(engine) as session:
+            mark = session.get(ImportSource, source) or ImportSource(source=source)
+            mark.imported += counts["stored"]
+            mark.updated_at = datetime.utcnow()
+            if complete:
+                mark.high_water = newest
+                mark.content_hash = content_hash
+            session.add(mark)
+            progress = session.get(ImportProgress, source)
+            if progress is not None:
+                session.delete(progress)
             session.commit()
-            print(f"✅ Added {len(newEntries)} search events into the DB.")
-    finally:
-        # Always clean up temp files, success or fail
-        if temp_file.exists():
-            os.remove(temp_file)
-        if output_file.exists():
-            os.remove(output_file)
+            high_water = mark.high_water
+        status = "imported" if complete else "partial"
+        print(f"✅ Import '{source}' {status}: {counts}")
+        return {"status": status, "source": source, "high_water": high_water, **counts}
+
+# ---- Background backfill ----
+# The background backfill starts at startup whenever the Takeout history is not fully
+# imported. Importing it sends every search to the model, so TAKEOUT_BACKFILL=0 turns that off;
+# POST /import/backfill/start or `python -m Backend.main import-takeout` then runs it on request.
+backfill_job = BackfillJob()
+
+def backfill_enabled() -> bool:
+    return os.getenv("TAKEOUT_BACKFILL", "1").lower() not in ("0", "false", "no")
+
+def needs_backfill() -> bool:
+    """The Takeout history was never fully imported, or an import of it was interrupted."""
+    if not MYACTIVITY_JSON_FILE or not os.path.exists(MYACTIVITY_JSON_FILE):
+        return False
+    with Session(engine) as session:
+        mark = session.get(ImportSource, TAKEOUT_SOURCE)
+        interrupted = session.get(ImportProgress, TAKEOUT_SOURCE)
+    return mark is None or mark.content_hash is None or interrupted is not None
+
+async def run_backfill(job: BackfillJob) -> dict[str, Any]:
+    """
+    Import the Takeout history in the background. Takeout lists activity newest first, so
+    streaming the file in order fills the dashboard from the most recent searches back.
+    """
+    print(f"🤖 Backfilling Takeout searches from {MYACTIVITY_JSON_FILE} in the background...")
+    result = await import_takeout(MYACTIVITY_JSON_FILE, job=job)
+    if result.get("stored"):
+        # It was trained before there was history to learn from
+        await asyncio.to_thread(train_local_classifier)
+    return result
+
 # ---------- DB INIT ----------
 
+def ensure_columns() -> None:
+    """Add columns declared on the models that an older DB file's tables don't have yet."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                    print(f"🔧 Added column {table.name}.{column.name}")
+
+def ensure_indexes() -> None:
+    """Create indexes declared on the models that an older DB file doesn't have yet."""
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
 async def init_db() -> None:
     db_path = ""
     if DATABASE_URL.startswith("sqlite:///"):
         db_path = DATABASE_URL.replace("sqlite:///", "", 1)
-    else : raise OSError("Database Url not in the expected sqlalchemy schema")
+    else:
+        raise OSError("Database Url not in the expected sqlalchemy schema")
     
     if db_path and not os.path.exists(db_path):
-        extract_queries(MYACTIVITY_JSON_FILE,"queries_extracted.json")
-        # Define seed paths
-        input_file = Path("queries_extracted.json")
-        output_file = Path("queries_classified.json")
-        prompt_file = Path("InferenceManager/prompts/system_prompt.txt")
-        
-        try:
-            
-            print("📀 Creating new DB...")
-            SQLModel.metadata.create_all(engine)
-
-            # Ensure input file exists (could be dummy queries if you want)
-            if not input_file.exists():
-                with open(input_file, "w") as f:
-                    json.dump({"queries": []}, f)   # or provide seed data here
-
-            # 1️⃣ Run InferenceManager in-process
-            print("🤖 Running InferenceManager to classify initial queries...")
-            await run_batch_inference_concurrently(input_file, output_file, prompt_file)
-
-            if not output_file.exists():
-                raise FileNotFoundError("❌ InferenceManager output file not found!")
-
-            # 2️⃣ Load results
-            print("📥 Populating DB from classified output...")
-            with open(output_file, "r") as f:
-                data = json.load(f)
-
-            classified_events = (
-                data.get("event") or
-                data.get(f"Filtered_queries", []) or
-                next(iter(data.values()), [])
-            )
-
-            imported = []
-            with Session(engine) as session:
-                for entry in classified_events:
-                    query = entry.get("query")
-                    timestamp_str = entry.get("timestamp")
-                    category = entry.get("category")
-                    if not query or not timestamp_str:
-                        continue
-
-                    timestamp = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-                    ev = SearchEvent(
-                        query=query,
-                        timestamp=timestamp,
-                        device_id=1,  # 🔧 placeholder, can pull from DEVICE_CACHE
-                        category=category
-                    )
-                    session.add(ev)
-                    imported.append(ev)
-                session.commit()
-
-            print(f"✅ Imported {len(imported)} search events into the DB.")
-        finally : 
-            # Always clean up temp files, success or fail
-            if input_file.exists():
-                os.remove(input_file)
-            if output_file.exists():
-                os.remove(output_file)
-
+        print("📀 Creating new DB...")
+        SQLModel.metadata.create_all(engine)
+        # The Takeout history is imported by the backfill job once the server is up
     else:
         print("📂 Using existing DB...")
+        SQLModel.metadata.create_all(engine)  # adds any tables introduced since the DB was created
+        ensure_columns()
+        ensure_indexes()
 
 
 # ---------- ROUTES ----------
@@ -279,12 +959,12 @@ def validate_environment() -> None:
     
     print("✅ Environment validation passed")
     
-def get_local_ip():
+def get_local_ip() -> str:
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
         # doesn't need to be reachable
         s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
+        ip: str = s.getsockname()[0]
     except Exception:
         ip = "127.0.0.1"
     finally:
@@ -297,39 +977,98 @@ async def on_startup() -> None:
     validate_environment()
     load_dotenv()
     DATABASE_URL = os.getenv("DATABASE_URL", "")
-    engine = create_engine(DATABASE_URL, echo=True)
+    engine = create_engine(DATABASE_URL, echo=SQL_ECHO)
     await init_db()
+    seed_classification_cache()
+    ensure_rollups()
+    build_category_index()
+    global snapshot_cache, snapshot_prefetcher
+    snapshot_cache = SnapshotCache(
+        SNAPSHOT_CACHE_DIR,
+        max_bytes=int(SNAPSHOT_CACHE_MAX_MB * 1024 * 1024),
+        ttl_seconds=SNAPSHOT_CACHE_TTL_HOURS * 3600,
+    )
+    snapshot_prefetcher = SnapshotPrefetcher(
+        get_snapshot,
+        SnapshotCache.key_for,
+        max_concurrent=PREFETCH_CONCURRENCY,
+        min_interval=PREFETCH_MIN_INTERVAL,
+    )
+    if needs_backfill():
+        if backfill_enabled():
+            backfill_job.start(run_backfill)  # runs once startup completes and requests are served
+        else:
+            print(
+                "📂 Takeout history not fully imported and TAKEOUT_BACKFILL=0. "
+                "POST /import/backfill/start to import it."
+            )
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        # Snapshots are optional; the pool retries the launch on first use
+        print(
+            f"⚠️ Snapshot browser not started ({e}). "
+            "Run `playwright install chromium` to enable snapshots."
+        )
     with Session(engine) as session:
         devices = session.exec(select(Device)).all()
         for d in devices:
-            DEVICE_CACHE[d.fingerprint] = d.id
+            DEVICE_CACHE[d.fingerprint] = d.id  # type: ignore[assignment]
         print(f"✅ Loaded {len(DEVICE_CACHE)} devices into cache")
-    # Start worker thread
-    global stop_event,worker_thread
-    stop_event = Event()
-    worker_thread = Thread(target=inference_worker,args=(stop_event,), daemon=True)
-    worker_thread.start()
+    # Start batch scheduler on the app's own event loop
+    global scheduler,pending_store
+    pending_store = PendingEventStore(engine)
+    scheduler = BatchScheduler(
+        process_batch,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait=MAX_WAIT_TIME,
+        max_in_flight=MAX_IN_FLIGHT_BATCHES,
+    )
+    scheduler.start()
+    # Replay events that were accepted but never classified before the last shutdown
+    unprocessed = pending_store.load_unprocessed()
+    if unprocessed:
+        scheduler.submit_many(unprocessed)
+        print(f"♻️ Replaying {len(unprocessed)} pending events from previous run")
+    # Training takes seconds on a large history; classify_events copes without it meanwhile
+    global _train_task
+    _train_task = asyncio.get_running_loop().create_task(_train_local_classifier_in_background())
     ip = get_local_ip()
     port = 8000  # or whatever port your backend uses
     print(f"🚀 Backend running at: http://{ip}:{port}")
-    print(f"Enter this url, right here 👉 http://{ip}:{port} 👈 in your frontend app to connect to backend. ")
+    print(
+        f"Enter this url, right here 👉 http://{ip}:{port} 👈 "
+        "in your frontend app to connect to backend. "
+    )
 
 @app.on_event("shutdown")
-def on_shutdown():
-    print("🛑 Shutdown signal received. Stopping worker...")
-    stop_event.set()          # Signal the worker to stop
-    worker_thread.join(5.0)   # Wait up to 5 seconds
-    print("✅ Worker stopped.")
+async def on_shutdown() -> None:
+    print("🛑 Shutdown signal received. Draining batch scheduler...")
+    # An interrupted backfill resumes from its last committed chunk on next startup
+    await backfill_job.stop()
+    if pending_store is not None:
+        await pending_store.flush()
+    if scheduler is not None:
+        # Classify what we can within the budget; the rest stays in the pending table
+        await scheduler.stop(timeout=SHUTDOWN_DRAIN_TIMEOUT, drain=True)
+    if pending_store is not None:
+        remaining = pending_store.count()
+        if remaining:
+            print(f"💾 {remaining} events left pending, they will be replayed on next startup.")
+    print("✅ Batch scheduler stopped.")
+    if snapshot_prefetcher is not None:
+        await snapshot_prefetcher.stop()
+    await browser_pool.stop()
     
 @app.get("/ping")
-async def ping():
+async def ping() -> dict[str, str]:
     return {"message": "pong", "status": "ok"}
 
 class DeviceValidationRequest(BaseModel):
     device_id: int
 
 @app.post("/validate-device/")
-def validate_device(request: DeviceValidationRequest):
+def validate_device(request: DeviceValidationRequest) -> dict[str, Any]:
     """
     Validates if a device_id exists in the current database.
     Returns validation status to help extensions determine if re-registration is needed.
@@ -343,7 +1082,7 @@ def validate_device(request: DeviceValidationRequest):
             # Device exists, also check if it's in cache
             if request.device_id not in DEVICE_CACHE.values():
                 # Device exists in DB but not in cache, add it back
-                DEVICE_CACHE[device.fingerprint] = device.id
+                DEVICE_CACHE[device.fingerprint] = device.id  # type: ignore[assignment]
                 print(f"✅ Restored device {device.id} to cache")
             
             return {
@@ -370,9 +1109,11 @@ class DeviceRegisterRequest(BaseModel):
 
 
 @app.post("/devices/")
-def register_device(payload: DeviceRegisterRequest):
+def register_device(payload: DeviceRegisterRequest) -> dict[str, Any]:
     # Generate deterministic fingerprint
-    fingerprint = make_fingerprint(payload.user_name, payload.device_name, payload.platform, payload.browser)
+    fingerprint = make_fingerprint(
+        payload.user_name, payload.device_name, payload.platform, payload.browser
+    )
 
     # Check in cache first (fast path)
     if fingerprint in DEVICE_CACHE:
@@ -385,7 +1126,7 @@ def register_device(payload: DeviceRegisterRequest):
         ).first()
 
         if existing:
-            DEVICE_CACHE[fingerprint] = existing.id
+            DEVICE_CACHE[fingerprint] = existing.id  # type: ignore[assignment]
             return {"device_id": existing.id}
 
         # Create new device
@@ -404,7 +1145,7 @@ def register_device(payload: DeviceRegisterRequest):
             raise RuntimeError("Device ID is None after commit/refresh — something went wrong")
         # Update cache
         DEVICE_CACHE[fingerprint] = device.id
-        print(f"✅ Registered New Device")
+        print("✅ Registered New Device")
         return {"device_id": device.id}
 
 
@@ -414,48 +1155,561 @@ class EventRequest(BaseModel):
     device_id: int
 
 @app.post("/events/")
-def push_event(event: EventRequest):
+async def push_event(event: EventRequest) -> dict[str, Any]:
     if event.device_id not in DEVICE_CACHE.values():
         return {"status": "error", "reason": "unregistered device"}
+    if scheduler is None or pending_store is None:
+        return {"status": "error", "reason": "backend not ready"}
     print(f"queued {event.query}")
-    queue.append(event.model_dump())
-    return {"status": "queued", "queue_size": len(queue)}
+    payload = event.model_dump()
+    pending_id = await pending_store.append(payload)  # durable before we acknowledge
+    queue_size = scheduler.submit((pending_id, payload))
+    return {"status": "queued", "queue_size": queue_size}
+
+
+BULK_ENQUEUE_CHUNK = 500     # events made durable and queued together
+BULK_MAX_REPORTED_ERRORS = 50
+
+def _validate_bulk_event(
+    item: object, device_ids: set[int]
+) -> tuple[dict[str, Any] | None, str | None]:
+    """Cheap structural check equivalent to EventRequest, without building a model per item."""
+    if isinstance(item, MalformedItem):
+        return None, f"invalid json: {item.error}"
+    if not isinstance(item, dict):
+        return None, "item is not an object"
+    query = item.get("query")
+    timestamp = item.get("timestamp")
+    device_id = item.get("device_id")
+    if not isinstance(query, str) or not query.strip():
+        return None, "missing or empty 'query'"
+    if not isinstance(timestamp, str) or not timestamp:
+        return None, "missing 'timestamp'"
+    if _parse_event_timestamp(timestamp) is None:
+        return None, "invalid 'timestamp' (expected ISO 8601)"
+    if not isinstance(device_id, int) or isinstance(device_id, bool):
+        return None, "missing or non-integer 'device_id'"
+    if device_id not in device_ids:
+        return None, "unregistered device"
+    return {"query": query, "timestamp": timestamp, "device_id": device_id}, None
+
+async def _enqueue_durably(events: list[dict[str, Any]]) -> int:
+    assert scheduler is not None and pending_store is not None
+    pending_ids = await pending_store.append_many(events)
+    return scheduler.submit_many(zip(pending_ids, events, strict=True))
+
+@app.post("/events/bulk")
+async def push_events_bulk(request: Request) -> dict[str, Any]:
+    """
+    Ingest many events in one request.
+    Body is either a JSON array of events or newline-delimited JSON (one event per line);
+    it is parsed incrementally and enqueued in chunks as it streams in.
+    """
+    if scheduler is None or pending_store is None:
+        return {"status": "error", "reason": "backend not ready"}
+
+    device_ids = set(DEVICE_CACHE.values())
+    decoder = JSONStreamDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    accepted = 0
+    rejected = 0
+    index = 0
+    errors: list[dict[str, Any]] = []
+    chunk: list[dict[str, Any]] = []
+    queue_size = len(scheduler)
+
+    def consume(items: list[Any]) -> None:
+        nonlocal accepted, rejected, index
+        for item in items:
+            event, reason = _validate_bulk_event(item, device_ids)
+            if event is None:
+                rejected += 1
+                if len(errors) < BULK_MAX_REPORTED_ERRORS:
+                    errors.append({"index": index, "reason": reason})
+            else:
+                chunk.append(event)
+                accepted += 1
+            index += 1
+
+    status = "queued"
+    try:
+        async for raw in request.stream():
+            consume(decoder.feed(utf8.decode(raw)))
+            if len(chunk) >= BULK_ENQUEUE_CHUNK:
+                queue_size = await _enqueue_durably(chunk)
+                chunk = []
+        consume(decoder.feed(utf8.decode(b"", final=True)))
+        consume(decoder.close())
+    except JSONStreamError as e:
+        # Items before the malformed point are still ingested
+        status = "error"
+        errors.append({"index": index, "reason": f"malformed body: {e}"})
+    if chunk:
+        queue_size = await _enqueue_durably(chunk)
+
+    print(f"queued {accepted} events in bulk ({rejected} rejected)")
+    return {
+        "status": status,
+        "accepted": accepted,
+        "rejected": rejected,
+        "errors": errors,
+        "queue_size": queue_size,
+    }
+
+@app.post("/import/takeout")
+async def post_import_takeout(source: str = Query(TAKEOUT_SOURCE)) -> dict[str, Any]:
+    """
+    Import what is new in MYACTIVITY_JSON_FILE since the last import of `source`,
+    e.g. after replacing it with a newer Takeout export.
+    """
+    if not MYACTIVITY_JSON_FILE or not os.path.exists(MYACTIVITY_JSON_FILE):
+        raise HTTPException(status_code=404, detail="MYACTIVITY_JSON_FILE not found")
+    return await import_takeout(MYACTIVITY_JSON_FILE, source)
+
+@app.get("/import/backfill")
+async def get_backfill_progress() -> dict[str, Any]:
+    """Progress of the background Takeout import: records done out of total, rate and ETA."""
+    return backfill_job.progress()
+
+@app.post("/import/backfill/start")
+async def post_start_backfill() -> dict[str, Any]:
+    """Start (or resume after a restart) the background Takeout import."""
+    if not MYACTIVITY_JSON_FILE or not os.path.exists(MYACTIVITY_JSON_FILE):
+        raise HTTPException(status_code=404, detail="MYACTIVITY_JSON_FILE not found")
+    if not backfill_job.start(run_backfill):
+        raise HTTPException(status_code=409, detail="Backfill already running")
+    return backfill_job.progress()
+
+@app.post("/import/backfill/pause")
+async def post_pause_backfill() -> dict[str, Any]:
+    """Pause the background import once the chunk in flight is committed."""
+    if not backfill_job.pause():
+        raise HTTPException(status_code=409, detail="No backfill running, or already paused")
+    return backfill_job.progress()
+
+@app.post("/import/backfill/resume")
+async def post_resume_backfill() -> dict[str, Any]:
+    if not backfill_job.resume():
+        raise HTTPException(status_code=409, detail="Backfill is not paused")
+    return backfill_job.progress()
+
+@app.get("/classification/stats")
+def get_classification_stats() -> dict[str, Any]:
+    """Counters showing how many events were answered without calling the model."""
+    with Session(engine) as session:
+        cache_size = session.exec(select(func.count()).select_from(QueryClassification)).one()
+    lookups = CLASSIFICATION_STATS["cache_hits"] + CLASSIFICATION_STATS["cache_misses"]
+    return {
+        **CLASSIFICATION_STATS,
+        "cache_hit_rate": CLASSIFICATION_STATS["cache_hits"] / lookups if lookups else 0.0,
+        "cache_size": cache_size,
+        "pending_events": pending_store.count() if pending_store else 0,
+        "dead_lettered_events": pending_store.count_dead() if pending_store else 0,
+        "local_classifier_samples": local_classifier.n_samples if local_classifier else 0,
+        "local_classifier_threshold": LOCAL_CLASSIFIER_THRESHOLD,
+    }
+
+@app.get("/classification/rules")
+def get_classification_rules() -> dict[str, Any]:
+    """Fast-path rules currently in effect, with per-rule hit counts."""
+    query_rules.reload_if_changed()
+    return {
+        "rules_file": str(query_rules.rules_file),
+        "last_error": query_rules.last_error,
+        "rules": query_rules.stats(),
+    }
+
+@app.post("/classification/rules/reload")
+def reload_classification_rules() -> dict[str, Any]:
+    """Force a re-read of the rules file."""
+    loaded = query_rules.reload()
+    return {
+        "status": "ok" if loaded else "error",
+        "last_error": query_rules.last_error,
+        "rules": len(query_rules.rules),
+    }
+
+PERIOD_WINDOWS: dict[str, timedelta] = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
+# ---- Analytics response cache ----
+# Responses are cached per (endpoint, parameters) and tagged with the write generation they
+# were computed at; any commit of new events bumps the generation and invalidates them.
+# Period windows also slide with the clock, so entries expire after ANALYTICS_CACHE_TTL.
+ANALYTICS_CACHE_TTL = 60  # seconds
+ANALYTICS_CACHE_MAX_ENTRIES = 256
+WRITE_GENERATION = 0
+# key -> (generation, created, etag, body), least recently used first. Sync endpoints run in the
+# threadpool and the warmer in a worker thread, so every access goes through the lock.
+ANALYTICS_CACHE: OrderedDict[tuple[Any, ...], tuple[int, float, str, bytes]] = OrderedDict()
+ANALYTICS_CACHE_LOCK = threading.Lock()
+_warm_task: asyncio.Task[None] | None = None
+
+def _store_analytics(
+    key: tuple[Any, ...], payload: object, generation: int
+) -> tuple[int, float, str, bytes]:
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    entry = (generation, time.monotonic(), etag, body)
+    with ANALYTICS_CACHE_LOCK:
+        current = ANALYTICS_CACHE.get(key)
+        if current is not None and current[0] > generation:
+            return current  # a slower computation must not replace a newer result
+        ANALYTICS_CACHE[key] = entry
+        ANALYTICS_CACHE.move_to_end(key)
+        while len(ANALYTICS_CACHE) > ANALYTICS_CACHE_MAX_ENTRIES:
+            ANALYTICS_CACHE.popitem(last=False)
+    return entry
+
+def _cached_analytics(key: tuple[Any, ...]) -> tuple[int, float, str, bytes] | None:
+    with ANALYTICS_CACHE_LOCK:
+        entry = ANALYTICS_CACHE.get(key)
+        if entry is not None:
+            ANALYTICS_CACHE.move_to_end(key)
+        return entry
+
+def _serve_cached_analytics(
+    request: Request, key: tuple[Any, ...], compute: Callable[[], Any]
+) -> Response:
+    """Serve a cached analytics payload with an ETag; 304 when the client's copy is current."""
+    entry = _cached_analytics(key)
+    if (
+        entry is None
+        or entry[0] != WRITE_GENERATION
+        or time.monotonic() - entry[1] > ANALYTICS_CACHE_TTL
+    ):
+        generation = WRITE_GENERATION  # captured first: a concurrent commit invalidates the result
+        entry = _store_analytics(key, compute(), generation)
+    _, _, etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _warm_analytics_cache() -> None:
+    """Precompute the dashboard's period views so the first load after a commit is a cache hit."""
+    generation = WRITE_GENERATION
+    summary = _compute_analytics_summary()
+    _store_analytics(("summary",), summary, generation)
+    for period, payload in summary["periods"].items():
+        _store_analytics(("analytics", period), payload, generation)
+
+async def _warm_analytics_cache_until_current() -> None:
+    while True:
+        generation = WRITE_GENERATION
+        await asyncio.to_thread(_warm_analytics_cache)
+        if generation == WRITE_GENERATION:
+            return
+
+def bump_write_generation(warm: bool = True) -> None:
+    """Invalidate cached analytics after events were committed; re-warm them in the background."""
+    global WRITE_GENERATION, _warm_task
+    WRITE_GENERATION += 1
+    if not warm:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if _warm_task is None or _warm_task.done():
+        _warm_task = loop.create_task(_warm_analytics_cache_until_current())
+
+def _compute_analytics(period: str) -> dict[str, Any]:
+    start_time = datetime.utcnow() - PERIOD_WINDOWS[period]
+
+    with Session(engine) as session:
+        category_counts = _category_counts_since(session, start_time)
 
-@app.get("/analytics/")
-def get_analytics(period: str = Query("day", regex="^(day|week|month|year)$")) -> dict[str, Any]:
+    return {
+        "period": period,
+        "total_queries": sum(category_counts.values()),
+        "category_distribution": category_counts,
+    }
+
+def _compute_analytics_summary() -> dict[str, Any]:
     """
-    Returns query counts and category distribution for a given period.
-    Period can be: day, week, month, year.
+    Distributions for every period in PERIOD_WINDOWS from one pass over the longest window.
+
+    All windows end now, so the shorter ones are nested in the longest; each source (daily
+    rollups, hourly rollups for partial days, raw rows for partial hours) is read once with
+    one conditional SUM per period.
     """
     now = datetime.utcnow()
-    if period == "day":
-        start_time = now - timedelta(days=1)
-    elif period == "week":
-        start_time = now - timedelta(weeks=1)
-    elif period == "month":
-        start_time = now - timedelta(days=30)
-    elif period == "year":
-        start_time = now - timedelta(days=365)
+    starts = {period: now - window for period, window in PERIOD_WINDOWS.items()}
+    hour_edges = {p: _ceil(start, "hour") for p, start in starts.items()}
+    day_edges = {p: max(_ceil(start, "day"), hour_edges[p]) for p, start in starts.items()}
+
+    def sums(
+        column: Any,  # noqa: ANN401 - model columns, typed as their Python values by SQLModel
+        value: Any,  # noqa: ANN401
+        ranges: dict[str, tuple[datetime, datetime | None]],
+    ) -> list[Any]:
+        return [
+            func.sum(case(
+                (and_(column >= lo, column < hi) if hi is not None else column >= lo, value),
+                else_=0,
+            ))
+            for lo, hi in ranges.values()
+        ]
+
+    periods = list(PERIOD_WINDOWS)
+    queries = [
+        # raw rows in the partial hour at the start of each window
+        select(
+            SearchEvent.category,
+            *sums(SearchEvent.timestamp, 1, {p: (starts[p], hour_edges[p]) for p in periods}),
+        )
+        .where(
+            or_(*(
+                and_(
+                    SearchEvent.timestamp >= starts[p],  # type: ignore[arg-type]
+                    SearchEvent.timestamp < hour_edges[p],  # type: ignore[arg-type]
+                )
+                for p in periods
+            ))
+        )
+        .group_by(SearchEvent.category),
+        # hourly rollups up to each window's first full day
+        select(
+            CategoryRollup.category,
+            *sums(
+                CategoryRollup.bucket_start,
+                CategoryRollup.count,
+                {p: (hour_edges[p], day_edges[p]) for p in periods},
+            ),
+        )
+        .where(
+            CategoryRollup.granularity == "hour",
+            or_(*(
+                and_(
+                    CategoryRollup.bucket_start >= hour_edges[p],  # type: ignore[arg-type]
+                    CategoryRollup.bucket_start < day_edges[p],  # type: ignore[arg-type]
+                )
+                for p in periods
+            )),
+        )
+        .group_by(CategoryRollup.category),
+        # daily rollups from there on; the longest window's range contains all others
+        select(
+            CategoryRollup.category,
+            *sums(
+                CategoryRollup.bucket_start,
+                CategoryRollup.count,
+                {p: (day_edges[p], None) for p in periods},
+            ),
+        )
+        .where(
+            CategoryRollup.granularity == "day",
+            CategoryRollup.bucket_start >= min(day_edges.values()),
+        )
+        .group_by(CategoryRollup.category),
+    ]
 
+    distributions: dict[str, dict[str, int]] = {p: {} for p in periods}
     with Session(engine) as session:
-        results = session.exec(
-            select(SearchEvent)
-            .where(SearchEvent.timestamp >= start_time)
-        ).all()
+        for stmt in queries:
+            for cat, *counts in session.exec(stmt).all():
+                cat = cat or "uncategorized"
+                for period, count in zip(periods, counts, strict=True):
+                    if count:
+                        distributions[period][cat] = distributions[period].get(cat, 0) + int(count)
+
+    return {
+        "periods": {
+            period: {
+                "period": period,
+                "total_queries": sum(distributions[period].values()),
+                "category_distribution": distributions[period],
+            }
+            for period in periods
+        }
+    }
 
-        total_queries = len(results)
+@app.get("/analytics/summary", response_model=None)
+def get_analytics_summary(request: Request) -> Response:
+    """Day, week, month and year distributions together, each shaped like /analytics/."""
+    return _serve_cached_analytics(request, ("summary",), _compute_analytics_summary)
 
-        # Count by category
-        category_counts = {}
-        for event in results:
-            cat = event.category or "uncategorized"
-            category_counts[cat] = category_counts.get(cat, 0) + 1
+@app.get("/analytics/", response_model=None)
+def get_analytics(
+    request: Request, period: str = Query("day", regex="^(day|week|month|year)$")
+) -> Response:
+    """
+    Returns query counts and category distribution for a given period.
+    Period can be: day, week, month, year.
+    """
+    return _serve_cached_analytics(
+        request, ("analytics", period), lambda: _compute_analytics(period)
+    )
+
+TIMESERIES_GRANULARITIES = ("hour", "day", "week", "month")
+TIMESERIES_MAX_POINTS = 5000
+# Shortest length of each granularity's bucket, to bound the bucket count of a range from above
+TIMESERIES_MIN_BUCKET = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(hours=23),  # DST spring-forward day
+    "week": timedelta(days=7) - timedelta(hours=1),
+    "month": timedelta(days=28) - timedelta(hours=1),
+}
+
+def _to_utc_naive(ts: datetime, tz: ZoneInfo) -> datetime:
+    """Convert a request datetime to the naive UTC form timestamps are stored in.
+    Naive inputs are taken to be in the requested timezone."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=tz)
+    return ts.astimezone(UTC).replace(tzinfo=None)
+
+def _timeseries_bucket(ts: datetime, granularity: str, tz: ZoneInfo) -> datetime:
+    """Local start of the bucket containing the naive-UTC timestamp `ts`."""
+    local = ts.replace(tzinfo=UTC).astimezone(tz)
+    if granularity == "hour":
+        return local.replace(minute=0, second=0, microsecond=0)
+    day = local.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    if granularity == "week":
+        day -= timedelta(days=day.weekday())  # weeks start on Monday
+    elif granularity == "month":
+        day = day.replace(day=1)
+    return day.replace(tzinfo=tz)
+
+def _next_bucket(bucket: datetime, granularity: str, tz: ZoneInfo) -> datetime:
+    if granularity == "hour":
+        # step in UTC so DST transitions neither skip nor repeat hours
+        return (bucket.astimezone(UTC) + timedelta(hours=1)).astimezone(tz)
+    naive = bucket.replace(tzinfo=None)
+    if granularity == "day":
+        naive += timedelta(days=1)
+    elif granularity == "week":
+        naive += timedelta(weeks=1)
+    else:
+        naive = naive.replace(year=naive.year + naive.month // 12, month=naive.month % 12 + 1)
+    return naive.replace(tzinfo=tz)
 
-        return {
-            "period": period,
-            "total_queries": total_queries,
-            "category_distribution": category_counts,
-        }
+def _timeseries_granularity(
+    start_utc: datetime, end_utc: datetime, granularity: str, max_points: int
+) -> str:
+    """
+    The finest granularity, starting at the requested one, whose buckets over the range fit in
+    `max_points`, so the buckets are never enumerated at a resolution that would be merged away.
+    Falls back to "month", where any excess is still merged into spans.
+    """
+    choices = TIMESERIES_GRANULARITIES[TIMESERIES_GRANULARITIES.index(granularity):]
+    for choice in choices:
+        # a range can also touch a partial bucket at each end
+        if (end_utc - start_utc) / TIMESERIES_MIN_BUCKET[choice] + 2 <= max_points:
+            return choice
+    return choices[-1]
+
+@app.get("/analytics/timeseries", response_model=None)
+def get_analytics_timeseries(
+    request: Request,
+    start: datetime | None = Query(  # noqa: B008
+        None, description="Range start (ISO 8601); defaults to 30 days before end"
+    ),
+    end: datetime | None = Query(  # noqa: B008
+        None, description="Range end (ISO 8601, exclusive); defaults to now"
+    ),
+    granularity: str = Query("day", pattern="^(hour|day|week|month)$"),
+    tz: str = Query(
+        "UTC", description="IANA timezone used for bucket boundaries, e.g. Europe/Dublin"
+    ),
+    max_points: int = Query(366, ge=1, le=TIMESERIES_MAX_POINTS),
+    device_id: int | None = Query(None),
+) -> Response:
+    """
+    Per-bucket category counts over [start, end).
+
+    Counts come from the rollup tables (raw rows only for partial hours at the edges) and
+    are bucketed in the requested timezone. When the range holds more than `max_points`
+    buckets, a coarser granularity is used instead (reported as `granularity`, next to
+    `requested_granularity`); past "month", consecutive buckets are merged so at most
+    `max_points` are returned, and `bucket_span` says how many buckets each point covers.
+    Timezones with sub-hour offsets are bucketed at hourly precision.
+    """
+    key = ("timeseries", tuple(sorted(request.query_params.multi_items())))
+    return _serve_cached_analytics(
+        request,
+        key,
+        lambda: _compute_timeseries(start, end, granularity, tz, max_points, device_id),
+    )
+
+def _compute_timeseries(
+    start: datetime | None,
+    end: datetime | None,
+    granularity: str,
+    tz: str,
+    max_points: int,
+    device_id: int | None,
+) -> dict[str, Any]:
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {tz}") from None
+
+    end_utc = _to_utc_naive(end, zone) if end is not None else datetime.utcnow()
+    start_utc = _to_utc_naive(start, zone) if start is not None else end_utc - timedelta(days=30)
+    if start_utc >= end_utc:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    requested_granularity = granularity
+    granularity = _timeseries_granularity(start_utc, end_utc, granularity, max_points)
+    # Daily rollups are cut at UTC midnight, so they only line up with UTC day buckets
+    use_daily = granularity != "hour" and zone.key in ("UTC", "Etc/UTC")
+
+    # Buckets are keyed by their UTC start: local wall times repeat when DST ends, and
+    # aware datetimes in the same zone compare equal regardless of `fold`
+    counts: dict[datetime, dict[str, int]] = {}
+    with Session(engine) as session:
+        for source, seg_start, seg_end in _rollup_segments(start_utc, end_utc, use_daily=use_daily):
+            rows = _segment_counts(
+                session, source, seg_start, seg_end, by_bucket=True, device_id=device_id
+            )
+            bucket_cache: dict[datetime, datetime] = {}
+            for ts, cat, n in rows:
+                bucket = bucket_cache.get(ts)
+                if bucket is None:
+                    bucket = _timeseries_bucket(ts, granularity, zone).astimezone(UTC)
+                    bucket_cache[ts] = bucket
+                per_cat = counts.setdefault(bucket, {})
+                per_cat[cat] = per_cat.get(cat, 0) + n
+
+    # Every bucket in range, including empty ones, so the series has no gaps
+    buckets: list[datetime] = []
+    bucket = _timeseries_bucket(start_utc, granularity, zone)
+    last = _timeseries_bucket(end_utc - timedelta(microseconds=1), granularity, zone)
+    last = last.astimezone(UTC)
+    while bucket.astimezone(UTC) <= last:
+        buckets.append(bucket.astimezone(UTC))
+        bucket = _next_bucket(bucket, granularity, zone)
+
+    span = max(1, -(-len(buckets) // max_points))  # ceil division
+    points = []
+    for i in range(0, len(buckets), span):
+        merged: dict[str, int] = {}
+        for b in buckets[i : i + span]:
+            for cat, n in counts.get(b, {}).items():
+                merged[cat] = merged.get(cat, 0) + n
+        points.append({
+            "start": buckets[i].astimezone(zone).isoformat(),
+            "total": sum(merged.values()),
+            "counts": merged,
+        })
+
+    categories = sorted({cat for per_cat in counts.values() for cat in per_cat})
+    return {
+        "start": start_utc.replace(tzinfo=UTC).astimezone(zone).isoformat(),
+        "end": end_utc.replace(tzinfo=UTC).astimezone(zone).isoformat(),
+        "granularity": granularity,
+        "requested_granularity": requested_granularity,
+        "timezone": tz,
+        "bucket_span": span,
+        "categories": categories,
+        "buckets": points,
+    }
 
 # ---------- RANDOM QUERY ENDPOINT ----------
 
@@ -472,134 +1726,322 @@ TAXONOMY_CATEGORIES = [
     "Miscellaneous"
 ]
 
-# Cache & Cursor trackers
-CATEGORY_CACHE: dict[str, list[SearchEvent]] = {}
-CATEGORY_CURSOR: dict[str, int] = {}
+# ---- Per-client cursors ----
+# Each client carries its own position as an opaque token (returned in the X-Next-Cursor
+# header and passed back as ?cursor=), so several frontends never move each other's place.
+# Pages are served from `category_index`, a compact in-memory copy of (id, query) per category:
+# sequential pages continue after the last id seen, random pages walk a seeded permutation of
+# the category's positions. Either way a request costs O(limit) regardless of category size.
+RANDOM_QUERY_MAX_LIMIT = 1000
+category_index = CategoryIndex()
+
+def build_category_index() -> None:
+    """Load (id, query) of all categorized events; process_batch appends to it afterwards."""
+    category_index.clear()
+    with Session(engine) as session:
+        rows = session.exec(
+            select(SearchEvent.category, SearchEvent.id, SearchEvent.query)
+            .where(SearchEvent.category.is_not(None))  # type: ignore[union-attr]
+            .order_by(SearchEvent.id)  # type: ignore[arg-type]
+            .execution_options(yield_per=CACHE_LOOKUP_CHUNK)
+        )
+        category_index.extend(rows)  # type: ignore[arg-type]
+        rows.close()
+    print(
+        f"✅ Indexed {len(category_index)} events "
+        f"across {len(category_index.counts())} categories"
+    )
+
+def _encode_cursor(state: dict[str, Any]) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_cursor(token: str | None, category: str) -> dict[str, Any] | None:
+    """Cursor state for this category; None for missing, malformed or foreign-category tokens."""
+    if not token:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(data, dict) or data.get("c") != category:
+        return None
+    return data
+
+def _int_field(state: dict[str, Any] | None, key: str) -> int | None:
+    value = state.get(key) if state is not None else None
+    return value if isinstance(value, int) and value >= 0 else None
+
+def _next_page(
+    category: str, limit: int, cursor: str | None, force_refresh: bool
+) -> tuple[list[tuple[int, str]], str]:
+    """
+    Next `limit` (id, query) pairs of the category in id order, plus the cursor for the page after.
+    Reaching the end of the category returns the final (possibly short) page and a cursor that
+    starts over, so the category is traversed cyclically; a cursor already past the end (its
+    events were removed) starts over right away rather than returning an empty page.
+    """
+    state = None if force_refresh else _decode_cursor(cursor, category)
+    after_id = _int_field(state, "a") or 0
+    page = category_index.page_after(category, after_id, limit)
+    if not page and after_id:
+        page = category_index.page_after(category, 0, limit)
+    at_end = not page or len(page) < limit or page[-1][0] == category_index.last_id(category)
+    next_after = 0 if at_end else page[-1][0]
+    return page, _encode_cursor({"c": category, "a": next_after})
+
+def _random_page(
+    category: str, limit: int, cursor: str | None, force_refresh: bool
+) -> tuple[list[tuple[int, str]], str]:
+    """
+    Next `limit` (id, query) pairs of a shuffle of the category, plus the cursor for the page after.
+
+    The cursor stores the shuffle's seed, the category size it was drawn over and the position
+    reached, so a client sees every event once per shuffle and each page is a uniform random
+    sample. The page that exhausts a shuffle returns a cursor with the seed of the next one
+    but no size yet, so that shuffle also covers events added in the meantime; either way a
+    cursor determines its page, which is what lets the next page be prefetched.
+    """
+    state = None if force_refresh else _decode_cursor(cursor, category)
+    seed, size, position = (_int_field(state, k) for k in ("s", "n", "p"))
+    if seed is None or position is None:
+        seed, size, position = random.getrandbits(32), None, 0
+    if size is None or size > category_index.size(category) or position >= size:
+        size, position = category_index.size(category), 0
+    permutation = IndexPermutation(size, seed)
+    stop = min(position + limit, size)
+    page = [category_index.entry_at(category, permutation[i]) for i in range(position, stop)]
+    if stop < size:
+        return page, _encode_cursor({"c": category, "s": seed, "n": size, "p": stop})
+    return page, _encode_cursor({"c": category, "s": random.getrandbits(32), "p": 0})
 
 @app.get("/random-query")
 def get_random_query(
+    response: Response,
     category: str = Query(...),
-    limit: int = Query(100),
-    force_refresh: bool = Query(False)
+    limit: int = Query(100, ge=1, le=RANDOM_QUERY_MAX_LIMIT),
+    force_refresh: bool = Query(False),
+    cursor: str | None = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    order: str = Query("sequential", pattern="^(sequential|random)$"),
 ) -> list[str] : 
     """
-    Returns next `limit` SearchEvent items in cyclic order for the given category.
-    Only refetches from DB when:
-    - cache is empty,
-    - fully cycled, or
-    - force_refresh=True
+    Returns next `limit` SearchEvent queries for the given category, either in cyclic id
+    order or (order=random) as a uniform random sample without repeats until the category
+    is exhausted. Pass the X-Next-Cursor header of the previous response as `cursor` to
+    continue; without it (or with force_refresh=True) a new traversal starts.
     """
-    key = category
-
-    # Initialize defaults
-    if key not in CATEGORY_CURSOR:
-        CATEGORY_CURSOR[key] = 0
-    if key not in CATEGORY_CACHE:
-        CATEGORY_CACHE[key] = []
-
-    # Check if we need to refetch
-    cache_empty = len(CATEGORY_CACHE[key]) == 0
-    fully_cycled = CATEGORY_CURSOR[key] == 0 and not cache_empty
-    
-    if cache_empty or fully_cycled or force_refresh:
-        with Session(engine) as session:
-            events = session.exec(
-                select(SearchEvent)
-                .where(SearchEvent.category == key)
-                .order_by(SearchEvent.id)
-            ).all()
-
-        CATEGORY_CACHE[key] = events
-        CATEGORY_CURSOR[key] = 0
-
-    all_events = CATEGORY_CACHE[key]
-
-    if not all_events:
-        return []
-
-    start = CATEGORY_CURSOR[key]
-    end = min(start + limit, len(all_events))
-    selected = all_events[start:end]
-
-    # Move cursor; if we reached the end, reset to 0 to trigger refetch next time
-    if end >= len(all_events):
-        CATEGORY_CURSOR[key] = 0
-    else:
-        CATEGORY_CURSOR[key] = end
-
-    return [s.query for s in selected]
+    fetch_page = _random_page if order == "random" else _next_page
+    page, next_cursor = fetch_page(category, limit, cursor, force_refresh)
+    response.headers["X-Next-Cursor"] = next_cursor
+    return [query for _, query in page]
+
+# ---- Snapshots ----
+# Rendered pages are cached on disk keyed by normalized query, so a query that comes round
+# again through /random-query is served without Chromium. Concurrent requests for the same
+# uncached query share one render.
+SNAPSHOT_CACHE_DIR = os.getenv("SNAPSHOT_CACHE_DIR", "snapshot_cache")
+SNAPSHOT_CACHE_MAX_MB = float(os.getenv("SNAPSHOT_CACHE_MAX_MB", "1024"))
+SNAPSHOT_CACHE_TTL_HOURS = float(os.getenv("SNAPSHOT_CACHE_TTL_HOURS", "168"))
+snapshot_cache: SnapshotCache | None = None
+# While a client looks at one page of snapshots, the next page is rendered in the background
+PREFETCH_CONCURRENCY = 2      # prefetch renders at once, leaving the rest of the pool to requests
+PREFETCH_MIN_INTERVAL = 0.25  # seconds between starting two prefetch renders
+snapshot_prefetcher: SnapshotPrefetcher | None = None
+SNAPSHOT_RENDERS: dict[str, asyncio.Task[CachedSnapshot]] = {}  # cache key -> render in progress
+# render -> callers awaiting it
+SNAPSHOT_RENDER_WAITERS: dict[asyncio.Task[CachedSnapshot], int] = {}
+
+async def _render_snapshot(query: str) -> CachedSnapshot:
+    assert snapshot_cache is not None
+    screenshot, thumbnail, html = await browser_pool.render(query)
+    return await asyncio.to_thread(snapshot_cache.put, query, screenshot, thumbnail, html)
+
+def _forget_render(key: str, task: asyncio.Task[CachedSnapshot]) -> None:
+    if SNAPSHOT_RENDERS.get(key) is task:
+        del SNAPSHOT_RENDERS[key]
+    SNAPSHOT_RENDER_WAITERS.pop(task, None)
+    if not task.cancelled():
+        task.exception()  # mark as retrieved; waiters get it re-raised
+
+async def get_snapshot(query: str) -> CachedSnapshot:
+    """
+    Cached snapshot of a query, rendering it on a miss (once, however many callers ask).
+    The render is cancelled when every caller waiting for it went away, e.g. the clients
+    streaming the page disconnected and the prefetcher dropped the job.
+    """
+    if snapshot_cache is None:
+        raise RuntimeError("Snapshot cache not initialised")
+    key = snapshot_cache.key_for(query)
+    task = SNAPSHOT_RENDERS.get(key)
+    if task is None:
+        cached = await asyncio.to_thread(snapshot_cache.get, query)
+        if cached is not None:
+            return cached
+        task = SNAPSHOT_RENDERS.get(key)  # another request may have started it meanwhile
+        if task is None:
+            task = asyncio.get_running_loop().create_task(_render_snapshot(query))
+            SNAPSHOT_RENDERS[key] = task
+            task.add_done_callback(lambda t: _forget_render(key, t))
+    # shield: one caller going away must not cancel the render for the others
+    SNAPSHOT_RENDER_WAITERS[task] = SNAPSHOT_RENDER_WAITERS.get(task, 0) + 1
+    try:
+        return await asyncio.shield(task)
+    finally:
+        waiters = SNAPSHOT_RENDER_WAITERS.get(task, 1) - 1
+        if waiters > 0:
+            SNAPSHOT_RENDER_WAITERS[task] = waiters
+        else:
+            SNAPSHOT_RENDER_WAITERS.pop(task, None)
+            task.cancel()  # no-op once it finished; otherwise nobody wants it anymore
+
+def snapshot_reference(query: str, cached: CachedSnapshot) -> dict[str, str]:
+    """What clients get for a snapshot: URLs to fetch its parts on demand, not the bytes."""
+    return {
+        "query": query,
+        "key": cached.key,
+        "thumbnail_url": f"/snapshots/{cached.key}/thumbnail",
+        "image_url": f"/snapshots/{cached.key}/image",
+        "html_url": f"/snapshots/{cached.key}/html",
+    }
+
+async def fetch_cached_snapshot(query: str) -> dict[str, str]:
+    return snapshot_reference(query, await get_snapshot(query))
+
+SNAPSHOT_PARTS = {
+    # part -> (file of the cache entry, media type, Content-Encoding)
+    "thumbnail": ("thumbnail_path", "image/jpeg", None),
+    "image": ("screenshot_path", "image/png", None),
+    "html": ("html_path", "text/html; charset=utf-8", "gzip"),
+}
+
+@app.get("/snapshots/{key}/{part}", response_model=None)
+def get_snapshot_part(request: Request, key: str, part: str) -> Response:
+    """
+    Serve one part of a cached snapshot. Bytes are streamed from the cache file; the HTML
+    is stored gzipped and sent with Content-Encoding: gzip. A snapshot only changes when it
+    is re-rendered after expiring, so clients may keep it until then.
+    """
+    if part not in SNAPSHOT_PARTS:
+        raise HTTPException(status_code=404, detail=f"Unknown snapshot part: {part}")
+    cached = snapshot_cache.get_by_key(key) if snapshot_cache is not None else None
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Snapshot not cached (expired or evicted)")
+    path_attr, media_type, encoding = SNAPSHOT_PARTS[part]
+    etag = f'"{key[:16]}-{int(cached.created_at)}"'
+    max_age = max(int(cached.created_at + SNAPSHOT_CACHE_TTL_HOURS * 3600 - time.time()), 0)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    if encoding == "gzip" and "gzip" not in request.headers.get("accept-encoding", ""):
+        return Response(content=cached.read_html(), media_type=media_type, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return FileResponse(getattr(cached, path_attr), media_type=media_type, headers=headers)
+
+@app.get("/snapshots/stats")
+def get_snapshot_stats() -> dict[str, Any]:
+    return {
+        "cache": snapshot_cache.stats() if snapshot_cache is not None else None,
+        "renders_in_progress": len(SNAPSHOT_RENDERS),
+        "prefetch": snapshot_prefetcher.stats() if snapshot_prefetcher is not None else None,
+        "browser_running": browser_pool.running,
+    }
+
+async def _snapshot_line(index: int, query: str) -> dict[str, Any]:
+    """One NDJSON line of the snapshot stream; a failed render is reported rather than raised."""
+    try:
+        return {"index": index, **(await fetch_cached_snapshot(query)), "error": None}
+    except Exception as e:
+        print(f"❌ Error fetching snapshot for {query}: {e}")
+        return {
+            "index": index,
+            "query": query,
+            "key": None,
+            "thumbnail_url": None,
+            "image_url": None,
+            "html_url": None,
+            "error": str(e),
+        }
 
+@app.get("/random-query/snapshots", response_model=None)
 async def get_random_query_with_snapshots(
     category: str = Query(...),
-    limit: int = Query(100),
-    force_refresh: bool = Query(False)
-) -> list[dict[str, str]] : 
-    """
-    Returns next `limit` SearchEvent items in cyclic order for the given category.
-    Only refetches from DB when:
-    - cache is empty,
-    - fully cycled, or
-    - force_refresh=True
-    """
-    key = category
-
-    # Initialize defaults
-    if key not in CATEGORY_CURSOR:
-        CATEGORY_CURSOR[key] = 0
-    if key not in CATEGORY_CACHE:
-        CATEGORY_CACHE[key] = []
-
-    # Check if we need to refetch
-    cache_empty = len(CATEGORY_CACHE[key]) == 0
-    fully_cycled = CATEGORY_CURSOR[key] == 0 and not cache_empty
-    
-    if cache_empty or fully_cycled or force_refresh:
-        with Session(engine) as session:
-            events = session.exec(
-                select(SearchEvent)
-                .where(SearchEvent.category == key)
-                .order_by(SearchEvent.id)
-            ).all()
-
-        CATEGORY_CACHE[key] = events
-        CATEGORY_CURSOR[key] = 0
-
-    all_events = CATEGORY_CACHE[key]
-
-    if not all_events:
-        return []
-
-    start = CATEGORY_CURSOR[key]
-    end = min(start + limit, len(all_events))
-    selected = all_events[start:end]
+    limit: int = Query(100, ge=1, le=RANDOM_QUERY_MAX_LIMIT),
+    force_refresh: bool = Query(False),
+    cursor: str | None = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    order: str = Query("sequential", pattern="^(sequential|random)$"),
+    prefetch: bool = Query(True, description="Render the next page's snapshots in the background"),
+) -> StreamingResponse:
+    """
+    Streams the next `limit` queries of the category (see get_random_query) as NDJSON,
+    each with references to its Google snapshot (see /snapshots/{key}/{part}).
 
-    # Move cursor; if we reached the end, reset to 0 to trigger refetch next time
-    CATEGORY_CURSOR[key] = 0 if end >= len(all_events) else end
-    
-    # Concurrently fetch Google snapshots for each query
-    tasks = [fetch_google_snapshot(s.query) for s in selected]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    enriched = []
-    for i in range(len(selected)):
-        s = selected[i]
-        r = results[i]
-
-        if isinstance(r, Exception):
-            print(f"❌ Error fetching snapshot for {s.query}: {r}")
-            enriched.append({
-                "query": s.query,
-                "snapshot": None,
-                "html": None
-            })
-        else:
-            enriched.append({
-                "query": s.query,
-                "snapshot": r.get("snapshot") if isinstance(r, dict) else None,
-                "html":r.get("html") if isinstance(r, dict) else None
-            })
+    Lines are written as soon as each snapshot is available (cached ones first), so they
+    arrive out of order; `index` is the query's position in the page. The cursor for the
+    next page is in the X-Next-Cursor header; pages are deterministic given the cursor,
+    so the next one is prefetched while the client looks at this one.
+    """
+    fetch_page = _random_page if order == "random" else _next_page
+    page, next_cursor = await asyncio.to_thread(fetch_page, category, limit, cursor, force_refresh)
+    if snapshot_prefetcher is not None:
+        for _, query in page:
+            snapshot_prefetcher.record_request(query)
+        snapshot_prefetcher.claim(cursor)
+        if prefetch:
+            upcoming, _ = await asyncio.to_thread(fetch_page, category, limit, next_cursor, False)
+            snapshot_prefetcher.schedule(next_cursor, [query for _, query in upcoming])
+
+    async def stream() -> AsyncIterator[str]:
+        tasks = [
+            asyncio.ensure_future(_snapshot_line(i, query)) for i, (_, query) in enumerate(page)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Client went away: stop waiting. Renders nobody else waits for are cancelled.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Next-Cursor": next_cursor, "Cache-Control": "no-store"},
+    )
+
+def run_command(command: str, *args: str) -> None:
+    """Maintenance commands run against the configured DB without starting the server."""
+    global engine, DATABASE_URL
+    # print() goes through the uvicorn logger
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    validate_environment()
+    DATABASE_URL = os.getenv("DATABASE_URL", "")
+    engine = create_engine(DATABASE_URL)
+    SQLModel.metadata.create_all(engine)
+    ensure_columns()
+    ensure_indexes()
+    if command == "rebuild-rollups":
+        rebuild_rollups()
+    elif command == "import-takeout":
+        train_local_classifier()
+        asyncio.run(import_takeout(args[0] if args else MYACTIVITY_JSON_FILE))
+    else:
+        raise SystemExit(f"Unknown command: {command}")
 
-    return enriched
+@app.post("/analytics/rollups/rebuild")
+def post_rebuild_rollups() -> dict[str, Any]:
+    """Recompute rollups from raw events, e.g. after importing data outside the backend."""
+    return {"status": "ok", "rollup_rows": rebuild_rollups()}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # e.g. python -m Backend.main rebuild-rollups
+        #      python -m Backend.main import-takeout [path/to/MyActivity.json]
+        run_command(sys.argv[1], *sys.argv[2:])
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
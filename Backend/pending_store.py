@@ -0,0 +1,176 @@
+# Backend/pending_store.py
+import asyncio
+import json
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Engine, delete, insert, update
+from sqlmodel import Field, Session, SQLModel, func, select
+
+
+class PendingEvent(SQLModel, table=True):
+    """An accepted event that has not been classified and stored as a SearchEvent yet."""
+    id: int | None = Field(default=None, primary_key=True)
+    payload: str  # JSON-encoded event as received by the API
+    received_at: datetime = Field(default_factory=datetime.utcnow)
+    # failed classifications so far
+    attempts: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    last_error: str | None = None
+    dead_at: datetime | None = None  # set when the event is given up on (dead letter)
+
+
+class PendingEventStore:
+    """
+    Write-ahead log for incoming events, kept in the PendingEvent table.
+
+    Appends made within `commit_interval` seconds of each other are written in a single
+    transaction (group commit), and every caller is only released once its event is durable.
+    Rows are deleted by `mark_processed` in the same transaction that stores the classified
+    events, so anything left in the table on startup still needs to be classified.
+
+    Failed classifications are counted per row by `record_failure`; a row that fails
+    `max_attempts` times, or can never succeed (`dead_letter`), is kept with `dead_at` set
+    for inspection but is no longer replayed.
+    """
+
+    def __init__(self, engine: Engine, commit_interval: float = 0.005) -> None:
+        self.engine = engine
+        self.commit_interval = commit_interval
+        self._buffer: list[tuple[list[dict[str, Any]], asyncio.Future[list[int]]]] = []
+        self._flusher: asyncio.Task[None] | None = None
+
+    async def append(self, event: dict[str, Any]) -> int:
+        """Durably record one event and return its pending id."""
+        return (await self.append_many([event]))[0]
+
+    async def append_many(self, events: list[dict[str, Any]]) -> list[int]:
+        """Durably record several events and return their pending ids, in order."""
+        if not events:
+            return []
+        future: asyncio.Future[list[int]] = asyncio.get_running_loop().create_future()
+        self._buffer.append((events, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_after_interval())
+        return await future
+
+    async def flush(self) -> None:
+        """Commit whatever is currently buffered."""
+        if self._flusher is not None and not self._flusher.done():
+            await self._flusher
+        if self._buffer:
+            await self._commit_buffered()
+
+    async def _flush_after_interval(self) -> None:
+        # Appends that arrive while a group is being committed go into the next group
+        while self._buffer:
+            await asyncio.sleep(self.commit_interval)
+            await self._commit_buffered()
+
+    async def _commit_buffered(self) -> None:
+        group, self._buffer = self._buffer, []
+        rows = [event for events, _ in group for event in events]
+        try:
+            ids = await asyncio.to_thread(self._insert, rows)
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        offset = 0
+        for events, future in group:
+            if not future.done():
+                future.set_result(ids[offset:offset + len(events)])
+            offset += len(events)
+
+    def _insert(self, rows: list[dict[str, Any]]) -> list[int]:
+        now = datetime.utcnow()
+        params = [
+            {"payload": json.dumps(row, ensure_ascii=False), "received_at": now} for row in rows
+        ]
+        with Session(self.engine) as session:
+            result = session.execute(
+                insert(PendingEvent).returning(
+                    PendingEvent.id, sort_by_parameter_order=True  # type: ignore[call-overload]
+                ),
+                params,
+            )
+            ids = [row[0] for row in result]
+            session.commit()
+        return ids
+
+    def load_unprocessed(self) -> list[tuple[int, dict[str, Any]]]:
+        """Return (pending_id, event) for every event that was never classified, oldest first."""
+        with Session(self.engine) as session:
+            rows = session.exec(
+                select(PendingEvent.id, PendingEvent.payload)
+                .where(PendingEvent.dead_at.is_(None))  # type: ignore[union-attr]
+                .order_by(PendingEvent.id)  # type: ignore[arg-type]
+            ).all()
+        return [(int(row_id), json.loads(payload)) for row_id, payload in rows]  # type: ignore[arg-type]
+
+    def count(self) -> int:
+        """Events still waiting to be classified."""
+        with Session(self.engine) as session:
+            return session.exec(
+                select(func.count())
+                .select_from(PendingEvent)
+                .where(PendingEvent.dead_at.is_(None))  # type: ignore[union-attr]
+            ).one()
+
+    def count_dead(self) -> int:
+        with Session(self.engine) as session:
+            return session.exec(
+                select(func.count())
+                .select_from(PendingEvent)
+                .where(PendingEvent.dead_at.is_not(None))  # type: ignore[union-attr]
+            ).one()
+
+    def record_failure(
+        self, pending_ids: list[int], error: str, max_attempts: int
+    ) -> dict[int, int]:
+        """
+        Count a failed classification attempt for each row; rows that reach `max_attempts`
+        become dead letters. Returns {pending_id: attempts so far} for the rows to retry.
+        """
+        if not pending_ids:
+            return {}
+        in_ids = PendingEvent.id.in_(pending_ids)  # type: ignore[union-attr]
+        with Session(self.engine) as session:
+            session.execute(
+                update(PendingEvent)
+                .where(in_ids)
+                .values(attempts=PendingEvent.attempts + 1, last_error=error)
+            )
+            session.execute(
+                update(PendingEvent)
+                .where(in_ids, PendingEvent.attempts >= max_attempts)  # type: ignore[arg-type]
+                .values(dead_at=datetime.utcnow())
+            )
+            rows = session.exec(
+                select(PendingEvent.id, PendingEvent.attempts)
+                .where(in_ids, PendingEvent.dead_at.is_(None))  # type: ignore[union-attr]
+            ).all()
+            session.commit()
+        return {row_id: attempts for row_id, attempts in rows if row_id is not None}
+
+    def dead_letter(self, pending_ids: list[int], error: str) -> None:
+        """Give up on rows that can never be stored, e.g. with an unparseable timestamp."""
+        if not pending_ids:
+            return
+        with Session(self.engine) as session:
+            session.execute(
+                update(PendingEvent)
+                .where(PendingEvent.id.in_(pending_ids))  # type: ignore[union-attr]
+                .values(
+                    attempts=PendingEvent.attempts + 1, last_error=error, dead_at=datetime.utcnow()
+                )
+            )
+            session.commit()
+
+    @staticmethod
+    def mark_processed(session: Session, pending_ids: Iterable[int]) -> None:
+        """Delete pending rows as part of the caller's transaction."""
+        ids = list(pending_ids)
+        if ids:
+            session.execute(delete(PendingEvent).where(PendingEvent.id.in_(ids)))  # type: ignore[union-attr]
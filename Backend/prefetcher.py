@@ -0,0 +1,143 @@
+# Backend/prefetcher.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+logger = logging.getLogger("uvicorn")
+
+
+class SnapshotPrefetcher:
+    """
+    Renders snapshots for pages a client is expected to ask for next.
+
+    Each prefetch job is registered under the token the client will present when it asks for
+    that page (the cursor of the next page). When the client does ask, the job is claimed:
+    its queries are no longer speculative, so the job starts no further renders and the
+    request takes over; a render it already has running is left to finish, since the request
+    joins it. Starting more than `max_jobs` jobs cancels the oldest one, and with it any
+    render nobody else is waiting for.
+
+    Work is rate-limited: at most `max_concurrent` prefetch renders run at once, and
+    consecutive renders start at least `min_interval` seconds apart, so prefetching only
+    uses capacity the foreground leaves over.
+
+    Hit rate: requests for a key that was prefetched and finished count as hits, requests
+    for one still rendering as late, and anything else as misses.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Any]],
+        key_for: Callable[[str], str],
+        max_concurrent: int = 2,
+        min_interval: float = 0.25,
+        max_jobs: int = 16,
+        max_tracked: int = 10_000,
+    ) -> None:
+        self.fetch = fetch
+        self.key_for = key_for
+        self.min_interval = min_interval
+        self.max_jobs = max_jobs
+        self.max_tracked = max_tracked
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._rate_lock = asyncio.Lock()
+        self._next_start = 0.0
+        self._jobs: OrderedDict[str, asyncio.Task[None]] = OrderedDict()
+        self._claimed: set[asyncio.Task[None]] = set()  # jobs to stop once their render finishes
+        self._prefetched: OrderedDict[str, bool] = OrderedDict()  # key -> finished
+        self.counters = {
+            "scheduled": 0, "fetched": 0, "failed": 0, "cancelled": 0,
+            "hits": 0, "late": 0, "misses": 0,
+        }
+
+    def schedule(self, token: str, queries: Sequence[str]) -> None:
+        """Prefetch `queries`, to be claimed by a request presenting `token`."""
+        if not queries or token in self._jobs:
+            return
+        while len(self._jobs) >= self.max_jobs:
+            _, oldest = self._jobs.popitem(last=False)
+            oldest.cancel()
+        task = asyncio.get_running_loop().create_task(self._run(list(queries)))
+        self._jobs[token] = task
+        task.add_done_callback(lambda t: self._job_done(token, t))
+
+    def claim(self, token: str | None) -> None:
+        """A client asked for the page prefetched under `token`; stop speculating about it."""
+        task = self._jobs.pop(token, None) if token else None
+        if task is not None:
+            self._claimed.add(task)
+
+    def record_request(self, query: str) -> None:
+        """Count a foreground request for a query's snapshot towards the hit rate."""
+        finished = self._prefetched.get(self.key_for(query))
+        if finished is None:
+            self.counters["misses"] += 1
+        elif finished:
+            self.counters["hits"] += 1
+        else:
+            self.counters["late"] += 1
+
+    async def stop(self) -> None:
+        tasks = list(self._jobs.values())
+        self._jobs.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _job_done(self, token: str, task: asyncio.Task[None]) -> None:
+        if self._jobs.get(token) is task:
+            del self._jobs[token]
+        self._claimed.discard(task)
+        if task.cancelled():
+            self.counters["cancelled"] += 1
+
+    def _track(self, key: str, finished: bool) -> None:
+        self._prefetched[key] = finished
+        self._prefetched.move_to_end(key)
+        while len(self._prefetched) > self.max_tracked:
+            self._prefetched.popitem(last=False)
+
+    async def _wait_for_turn(self) -> None:
+        async with self._rate_lock:
+            delay = self._next_start - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = time.monotonic() + self.min_interval
+
+    async def _run(self, queries: list[str]) -> None:
+        job = asyncio.current_task()
+        for query in queries:
+            key = self.key_for(query)
+            if self._prefetched.get(key):
+                continue
+            if job in self._claimed:
+                return
+            async with self._slots:
+                await self._wait_for_turn()
+                if job in self._claimed:  # claimed while waiting for a slot
+                    return
+                self.counters["scheduled"] += 1
+                self._track(key, False)
+                try:
+                    await self.fetch(query)
+                except asyncio.CancelledError:
+                    self._prefetched.pop(key, None)
+                    raise
+                except Exception as e:
+                    self._prefetched.pop(key, None)
+                    self.counters["failed"] += 1
+                    logger.info(f"⚠️ Prefetch failed for {query}: {e}")
+                    continue
+                self._track(key, True)
+                self.counters["fetched"] += 1
+
+    def stats(self) -> dict[str, Any]:
+        requests = self.counters["hits"] + self.counters["late"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "active_jobs": len(self._jobs),
+            "hit_rate": self.counters["hits"] / requests if requests else None,
+        }
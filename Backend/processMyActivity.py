@@ -1,35 +1,61 @@
+import io
 import json
+from collections.abc import Callable, Iterator
 from pathlib import Path
 
-def extract_queries(input_path: str, output_path: str):
-    input_file = Path(input_path)
+from Backend.streaming_json import JSONStreamDecoder
+
+READ_CHUNK_CHARS = 1 << 16  # characters decoded per read; memory stays around one chunk + one entry
+
+
+def iter_search_records(
+    input_path: str | Path, on_read: Callable[[int], None] | None = None
+) -> Iterator[dict[str, str]]:
+    """
+    Yield {"query", "timestamp"} for each "Searched for ..." entry of a Takeout MyActivity.json,
+    in file order.
+
+    The file is decoded incrementally, so memory use doesn't grow with the size of the export.
+    `on_read(bytes_read)` is called after each read, e.g. to estimate progress from file size.
+    """
+    decoder = JSONStreamDecoder()
+    with Path(input_path).open("rb") as raw, io.TextIOWrapper(raw, encoding="utf-8") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_CHARS)
+            if on_read is not None:
+                on_read(raw.tell())
+            entries = decoder.feed(chunk) if chunk else decoder.close()
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                title = entry.get("title", "")
+                time = entry.get("time", "")
+
+                # We only want "Searched for ..." events
+                if isinstance(title, str) and title.startswith("Searched for "):
+                    query = title.replace("Searched for ", "", 1).strip()
+                    yield {
+                        "query": query,
+                        "timestamp": time
+                    }
+            if not chunk:
+                return
+
+
+def extract_queries(input_path: str, output_path: str) -> None:
     output_file = Path(output_path)
 
-    with input_file.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    cleaned = []
-    for entry in data:
-        title = entry.get("title", "")
-        time = entry.get("time", "")
-
-        # We only want "Searched for ..." events
-        if title.startswith("Searched for "):
-            query = title.replace("Searched for ", "", 1).strip()
-
-            record = {
-                "query": query,
-                "timestamp": time
-            }
-
-            cleaned.append(record)
-    # Wrap the list in a dict under "queries"
-    wrapped = {"queries": cleaned}
-
+    # Written as we go, wrapped in a dict under "queries"
+    count = 0
     with output_file.open("w", encoding="utf-8") as f:
-        json.dump(wrapped, f, indent=2, ensure_ascii=False)
-
-    print(f"Extracted {len(cleaned)} queries → {output_file}")
+        f.write('{\n  "queries": [')
+        for record in iter_search_records(input_path):
+            f.write(",\n    " if count else "\n    ")
+            f.write(json.dumps(record, ensure_ascii=False))
+            count += 1
+        f.write("\n  ]\n}\n" if count else "]\n}\n")
+
+    print(f"Extracted {count} queries → {output_file}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+# Backend/query_normalization.py
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w\s']+")
+_APOSTROPHES = re.compile(r"(?<!\w)'|'(?!\w)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a search query, used as a cache/lookup key.
+
+    Unicode-normalizes (NFKC), case-folds, turns punctuation into spaces (keeping in-word
+    apostrophes such as "don't") and collapses whitespace, so "Meaning of  'X'?" and
+    "meaning of x" map to the same key.
+    """
+    text = unicodedata.normalize("NFKC", query).casefold().replace("\u2019", "'")
+    text = _NON_WORD.sub(" ", text)
+    text = _APOSTROPHES.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
@@ -0,0 +1,117 @@
+# Backend/query_rules.py
+import json
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from Backend.query_normalization import normalize_query
+
+logger = logging.getLogger("uvicorn")
+
+
+@dataclass(frozen=True)
+class QueryRule:
+    name: str
+    category: str
+    patterns: tuple[str, ...]
+
+
+class QueryRuleEngine:
+    """
+    Deterministic classifier for high-frequency query shapes ("meaning of X", "define X", ...).
+
+    Rules are read from a JSON file of the form
+        {"rules": [{"name": ..., "category": ..., "patterns": [regex, ...]}, ...]}
+    and matched against the normalized query. All patterns are compiled into one alternation
+    with a named group per rule, so a query is matched in a single regex pass; the leftmost
+    match wins, and ties go to the rule listed first. The file is re-read whenever its
+    modification time changes, and a broken edit keeps the previous rules active.
+    Hit counts are kept per rule name.
+    """
+
+    def __init__(self, rules_file: str | Path) -> None:
+        self.rules_file = Path(rules_file)
+        self.rules: list[QueryRule] = []
+        self.hits: dict[str, int] = {}
+        self._matcher: re.Pattern[str] | None = None
+        self._group_to_rule: dict[str, QueryRule] = {}
+        self._mtime: float | None = None
+        self.last_error: str | None = None
+        self.reload_if_changed()
+
+    def reload_if_changed(self) -> bool:
+        """Reload the rules file if it changed on disk. Returns True when new rules were loaded."""
+        try:
+            mtime = self.rules_file.stat().st_mtime
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        return self.reload()
+
+    def reload(self) -> bool:
+        try:
+            with self.rules_file.open("r", encoding="utf-8") as f:
+                data: dict[str, Any] = json.load(f)
+            rules = [
+                QueryRule(
+                    name=str(r["name"]), category=str(r["category"]), patterns=tuple(r["patterns"])
+                )
+                for r in data.get("rules", [])
+            ]
+            matcher, group_to_rule = self._compile(rules)
+        except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+            self.last_error = str(e)
+            logger.info(f"❌ Could not load query rules from {self.rules_file}: {e}")
+            return False
+        self.rules = rules
+        self._matcher = matcher
+        self._group_to_rule = group_to_rule
+        self.last_error = None
+        for rule in rules:
+            self.hits.setdefault(rule.name, 0)
+        logger.info(f"✅ Loaded {len(rules)} query rules from {self.rules_file}")
+        return True
+
+    @staticmethod
+    def _compile(rules: list[QueryRule]) -> tuple[re.Pattern[str] | None, dict[str, QueryRule]]:
+        parts: list[str] = []
+        group_to_rule: dict[str, QueryRule] = {}
+        for i, rule in enumerate(rules):
+            for pattern in rule.patterns:
+                re.compile(pattern)  # report the offending pattern on its own
+            group = f"r{i}"
+            group_to_rule[group] = rule
+            parts.append(f"(?P<{group}>" + "|".join(f"(?:{p})" for p in rule.patterns) + ")")
+        if not parts:
+            return None, group_to_rule
+        return re.compile("|".join(parts)), group_to_rule
+
+    def match(self, query: str) -> QueryRule | None:
+        """Return the first rule matching the query, counting the hit."""
+        return self.match_normalized(normalize_query(query))
+
+    def match_normalized(self, normalized: str) -> QueryRule | None:
+        """Same as match() for a query that already went through normalize_query()."""
+        if self._matcher is None:
+            return None
+        m = self._matcher.search(normalized)
+        if m is None or m.lastgroup is None:
+            return None
+        rule = self._group_to_rule[m.lastgroup]
+        self.hits[rule.name] = self.hits.get(rule.name, 0) + 1
+        return rule
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "name": r.name,
+                "category": r.category,
+                "patterns": list(r.patterns),
+                "hits": self.hits.get(r.name, 0),
+            }
+            for r in self.rules
+        ]
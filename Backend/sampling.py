@@ -0,0 +1,53 @@
+# Backend/sampling.py
+import random
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(value: int, key: int) -> int:
+    """64-bit avalanche mix (splitmix64 finalizer) of value keyed by key."""
+    z = (value + key + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+class IndexPermutation:
+    """
+    Pseudo-random bijection of range(n) determined by (n, seed), evaluated one index at a time.
+
+    A balanced Feistel network permutes the smallest even-width power of two >= n, and
+    cycle-walking maps it back into range(n). Nothing is materialized, so taking the first
+    k elements of a shuffle costs O(k) regardless of n; the same (n, seed) always gives the
+    same order, which lets a client resume a shuffle from just the seed and a position.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, n: int, seed: int) -> None:
+        if n < 0:
+            raise ValueError("n must be non-negative")
+        self.n = n
+        self.seed = seed
+        half_bits = max(1, ((max(n, 2) - 1).bit_length() + 1) // 2)
+        self._half_bits = half_bits
+        self._half_mask = (1 << half_bits) - 1
+        rng = random.Random(seed)
+        self._keys = [rng.getrandbits(64) for _ in range(self.ROUNDS)]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _encrypt(self, x: int) -> int:
+        left, right = x >> self._half_bits, x & self._half_mask
+        for key in self._keys:
+            left, right = right, left ^ (_mix(right, key) & self._half_mask)
+        return (left << self._half_bits) | right
+
+    def __getitem__(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError("permutation index out of range")
+        x = self._encrypt(i)
+        while x >= self.n:  # the domain is < 4n, so this takes < 4 steps on average
+            x = self._encrypt(x)
+        return x
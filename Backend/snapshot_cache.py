@@ -0,0 +1,193 @@
+# Backend/snapshot_cache.py
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from Backend.query_normalization import normalize_query
+
+logger = logging.getLogger("uvicorn")
+
+SCREENSHOT_FILE = "screenshot.png"
+THUMBNAIL_FILE = "thumbnail.jpg"
+HTML_FILE = "page.html.gz"
+META_FILE = "meta.json"
+ENTRY_FILES = (SCREENSHOT_FILE, THUMBNAIL_FILE, HTML_FILE, META_FILE)
+
+_KEY = re.compile(r"[0-9a-f]{64}")
+
+
+@dataclass(frozen=True)
+class CachedSnapshot:
+    key: str
+    query: str
+    created_at: float
+    path: Path
+
+    @property
+    def screenshot_path(self) -> Path:
+        return self.path / SCREENSHOT_FILE
+
+    @property
+    def thumbnail_path(self) -> Path:
+        return self.path / THUMBNAIL_FILE
+
+    @property
+    def html_path(self) -> Path:
+        """Gzip-compressed HTML; can be sent as-is with Content-Encoding: gzip."""
+        return self.path / HTML_FILE
+
+    def read_screenshot(self) -> bytes:
+        return (self.path / SCREENSHOT_FILE).read_bytes()
+
+    def read_html(self) -> str:
+        with gzip.open(self.path / HTML_FILE, "rt", encoding="utf-8") as f:
+            return f.read()
+
+
+@dataclass
+class _IndexEntry:
+    size: int
+    created_at: float
+
+
+class SnapshotCache:
+    """
+    Content-addressed on-disk store of rendered search pages.
+
+    An entry lives in `<directory>/<key[:2]>/<key>/`, where key is the sha256 of the
+    normalized query, and holds the full-page PNG screenshot (already compressed), a JPEG
+    thumbnail, the gzipped HTML and a small meta.json. Entries older than `ttl_seconds` are
+    treated as misses and removed; when the total size exceeds `max_bytes` the least recently
+    used entries are evicted. Recency is the mtime of meta.json, touched on every hit, so the
+    LRU order survives restarts without an index file.
+
+    Methods do blocking file I/O; call them through asyncio.to_thread from the event loop.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int, ttl_seconds: float) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, _IndexEntry] = OrderedDict()  # least recently used first
+        self._bytes = 0
+        self._load_index()
+
+    @staticmethod
+    def key_for(query: str) -> str:
+        return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _load_index(self) -> None:
+        found: list[tuple[float, str, _IndexEntry]] = []
+        if self.directory.is_dir():
+            for meta in self.directory.glob(f"??/*/{META_FILE}"):
+                entry_dir = meta.parent
+                try:
+                    size = sum((entry_dir / name).stat().st_size for name in ENTRY_FILES)
+                    created_at = (entry_dir / SCREENSHOT_FILE).stat().st_mtime
+                    last_used = meta.stat().st_mtime
+                except OSError:
+                    shutil.rmtree(entry_dir, ignore_errors=True)  # half-written or damaged
+                    continue
+                found.append((last_used, entry_dir.name, _IndexEntry(size, created_at)))
+        for _, key, entry in sorted(found, key=lambda item: item[0]):
+            self._index[key] = entry
+            self._bytes += entry.size
+        if found:
+            megabytes = self._bytes / 1e6
+            logger.info(f"✅ Snapshot cache: {len(self._index)} entries, {megabytes:.1f} MB")
+        self._evict()
+
+    def get(self, query: str) -> CachedSnapshot | None:
+        return self.get_by_key(self.key_for(query))
+
+    def get_by_key(self, key: str) -> CachedSnapshot | None:
+        if not _KEY.fullmatch(key):
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if now - entry.created_at > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+        path = self._entry_path(key)
+        try:
+            os.utime(path / META_FILE)
+            with (path / META_FILE).open("r", encoding="utf-8") as f:
+                stored_query = str(json.load(f)["query"])
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._remove(key)
+            return None
+        return CachedSnapshot(key=key, query=stored_query, created_at=entry.created_at, path=path)
+
+    def put(self, query: str, screenshot: bytes, thumbnail: bytes, html: str) -> CachedSnapshot:
+        key = self.key_for(query)
+        final = self._entry_path(key)
+        tmp = self.directory / "tmp" / f"{key}.{uuid.uuid4().hex}"
+        tmp.mkdir(parents=True, exist_ok=True)
+        (tmp / SCREENSHOT_FILE).write_bytes(screenshot)
+        (tmp / THUMBNAIL_FILE).write_bytes(thumbnail)
+        with gzip.open(tmp / HTML_FILE, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(html)
+        with (tmp / META_FILE).open("w", encoding="utf-8") as f:
+            json.dump({"query": query, "normalized_query": normalize_query(query)}, f)
+        size = sum(f.stat().st_size for f in tmp.iterdir())
+        created_at = (tmp / SCREENSHOT_FILE).stat().st_mtime
+
+        with self._lock:
+            if key in self._index:
+                self._remove(key)
+            final.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, final)
+            self._index[key] = _IndexEntry(size, created_at)
+            self._bytes += size
+            self._evict()
+        return CachedSnapshot(key=key, query=query, created_at=created_at, path=final)
+
+    def _remove(self, key: str) -> None:
+        """Drop an entry; the caller holds the lock (or is the constructor)."""
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        shutil.rmtree(self._entry_path(key), ignore_errors=True)
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            oldest = next(iter(self._index))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,122 @@
+# Backend/streaming_json.py
+import json
+from dataclasses import dataclass
+from typing import Any
+
+MAX_ITEM_CHARS = 1_000_000  # refuse to buffer a single item larger than this
+
+
+class JSONStreamError(ValueError):
+    """Raised when a JSON array stream is malformed and cannot be resynchronised."""
+
+
+@dataclass
+class MalformedItem:
+    """Placeholder for an NDJSON line that could not be decoded."""
+    raw: str
+    error: str
+
+
+class JSONStreamDecoder:
+    """
+    Incrementally decodes either a top-level JSON array or newline-delimited JSON.
+
+    Feed it text as it arrives; each call returns the values completed so far, so memory
+    stays bounded by the size of a single item rather than the whole document.
+    The format is detected from the first non-whitespace character ('[' means array).
+    """
+
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._mode: str | None = None  # "array" | "ndjson"
+        self._expect_value = True      # array mode: next token is a value (vs ',' or ']')
+        self._finished = False         # array mode: closing ']' seen
+        self._seen_value = False       # array mode: at least one element decoded
+
+    def feed(self, text: str) -> list[Any]:
+        self._buf += text
+        if self._mode is None:
+            stripped = self._buf.lstrip()
+            if not stripped:
+                self._buf = ""
+                return []
+            self._mode = "array" if stripped[0] == "[" else "ndjson"
+            self._buf = stripped[1:] if self._mode == "array" else stripped
+        items = self._drain_array() if self._mode == "array" else self._drain_lines(final=False)
+        if len(self._buf) > MAX_ITEM_CHARS:
+            raise JSONStreamError(f"Single item exceeds {MAX_ITEM_CHARS} characters")
+        return items
+
+    def close(self) -> list[Any]:
+        """Signal end of input and return any trailing values."""
+        if self._mode == "ndjson":
+            return self._drain_lines(final=True)
+        if self._mode == "array":
+            items = self._drain_array(final=True)
+            if not self._finished:
+                raise JSONStreamError("Unexpected end of input: JSON array was not closed")
+            return items
+        return []
+
+    def _drain_lines(self, final: bool) -> list[Any]:
+        lines = self._buf.split("\n")
+        self._buf = "" if final else lines.pop()
+        items: list[Any] = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                items.append(MalformedItem(raw=line[:200], error=str(e)))
+        return items
+
+    def _drain_array(self, final: bool = False) -> list[Any]:
+        buf = self._buf
+        size = len(buf)
+        pos = 0
+        items: list[Any] = []
+        while True:
+            while pos < size and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos >= size:
+                break
+            if self._finished:
+                trailing = buf[pos : pos + 20]
+                raise JSONStreamError(f"Unexpected data after end of JSON array: {trailing!r}")
+            char = buf[pos]
+            if not self._expect_value:
+                if char == ",":
+                    self._expect_value = True
+                    pos += 1
+                    continue
+                if char == "]":
+                    self._finished = True
+                    pos += 1
+                    continue
+                raise JSONStreamError(f"Expected ',' or ']' but found {char!r}")
+            if char == "]" and not self._seen_value:  # empty array
+                self._finished = True
+                pos += 1
+                continue
+            try:
+                value, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if final:
+                    raise JSONStreamError(f"Malformed JSON array item: {e}") from e
+                break  # most likely an incomplete item; wait for more input
+            # A scalar cut off at the chunk boundary (e.g. "2." of "2.5") also decodes, so
+            # only accept a value once the delimiter following it has arrived.
+            lookahead = end
+            while lookahead < size and buf[lookahead] in " \t\r\n":
+                lookahead += 1
+            if not final and (lookahead >= size or buf[lookahead] not in ",]"):
+                break
+            items.append(value)
+            self._seen_value = True
+            self._expect_value = False
+            pos = end
+        self._buf = buf[pos:]
+        return items
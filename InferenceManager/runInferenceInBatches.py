@@ -4,14 +4,18 @@ Handles processing large datasets in batches using OpenAI's API.
 Includes both sequential and concurrent implementations.
 """
 
+import asyncio
+import hashlib
 import json
 import os
-from pathlib import Path
-import asyncio
-import time
 import sys
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from pathlib import Path
+from typing import Any, TextIO
+
 from dotenv import load_dotenv
-from openai import OpenAI, AsyncOpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from InferenceManager.config import (
     BATCH_SIZE,
@@ -29,12 +33,24 @@ from InferenceManager.utils import (
     validate_json_structure,
 )
 
+DEFAULT_PROMPT_FILE: Path = Path(__file__).parent / "prompts" / "system_prompt.txt"
+
 
 # ======================================================
 # ================ Helper / Shared Methods =============
 # ======================================================
 
-def print_progress_bar(iteration, total, prefix='', suffix='', batch_time=None, length=40, fill='█', empty='-', decimals=1):
+def print_progress_bar(
+    iteration: int,
+    total: int,
+    prefix: str = '',
+    suffix: str = '',
+    batch_time: float | None = None,
+    length: int = 40,
+    fill: str = '█',
+    empty: str = '-',
+    decimals: int = 1,
+) -> None:
     """
     Simple ASCII progress bar using print statements.
     """
@@ -50,7 +66,84 @@ def print_progress_bar(iteration, total, prefix='', suffix='', batch_time=None,
         print()  # move to next line after completion
 
 
-def process_batch(client: OpenAI, system_prompt: str, batch: list[dict], batch_id: int) -> list[dict]:
+def _checkpoint_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".checkpoint.jsonl")
+
+
+def _run_key(input_path: Path, total_items: int) -> dict[str, Any]:
+    """Identifies a run; the content hash keeps an edited input from reusing old batches."""
+    digest = hashlib.sha256()
+    with input_path.open("rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return {
+        "input": str(input_path.resolve()),
+        "sha256": digest.hexdigest(),
+        "items": total_items,
+        "batch_size": BATCH_SIZE,
+    }
+
+
+def _open_checkpoint(
+    output_path: Path, run_key: dict[str, Any]
+) -> tuple[TextIO, dict[int, list[dict[str, Any]]]]:
+    """
+    Open the checkpoint of a run writing to output_path.
+
+    The checkpoint is a JSON-lines file: a header line identifying the run (input file and its
+    content hash, item count, batch size), then one {"start", "results"} line per finished
+    batch holding its classified items. Batches left by an earlier run with the same header
+    are returned by start index so they can be skipped; a checkpoint from a different run
+    is discarded, as is a line torn by a crash mid-write.
+    Returns the file opened for appending, and the finished batches.
+    """
+    path = _checkpoint_path(output_path)
+    done: dict[int, list[dict[str, Any]]] = {}
+    if path.exists():
+        with path.open("r", encoding="utf-8") as f:
+            try:
+                same_run = json.loads(f.readline()) == run_key
+            except ValueError:
+                same_run = False
+            if same_run:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        done[int(record["start"])] = record["results"]
+                    except (ValueError, KeyError, TypeError):
+                        break  # torn write at the end of an interrupted run
+    # Rewrite it with only the intact batches before appending to it. The new copy is written
+    # and synced next to it, then swapped in, so a crash meanwhile still leaves a checkpoint.
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as out:
+        out.write(json.dumps(run_key) + "\n")
+        for start, results in done.items():
+            out.write(json.dumps({"start": start, "results": results}, ensure_ascii=False) + "\n")
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, path)
+    return path.open("a", encoding="utf-8"), done
+
+
+def _append_checkpoint(f: TextIO, start: int, results: list[dict[str, Any]]) -> None:
+    """Record a finished batch; on disk before the next batch starts counting on it."""
+    f.write(json.dumps({"start": start, "results": results}, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _finish_checkpoint(f: TextIO, output_path: Path, complete: bool) -> None:
+    """The output file is written; drop the checkpoint unless batches are still to be retried."""
+    f.close()
+    if complete:
+        _checkpoint_path(output_path).unlink(missing_ok=True)
+    else:
+        print(f"⚠️ Some batches failed; run again to retry them ({_checkpoint_path(output_path)})")
+
+
+def process_batch(
+    client: OpenAI, system_prompt: str, batch: list[dict[str, Any]], batch_id: int
+) -> list[dict[str, Any]]:
     """
     Send one batch of data items to the LLM and return filtered results.
     Sequential implementation.
@@ -73,7 +166,7 @@ def process_batch(client: OpenAI, system_prompt: str, batch: list[dict], batch_i
         return []
 
     try:
-        parsed: list[dict] = json.loads(content)
+        parsed: list[dict[str, Any]] = json.loads(content)
         if not isinstance(parsed, list) or not all(isinstance(x, dict) for x in parsed):
             raise ValueError("Expected list of dicts output.")
         return parsed
@@ -87,9 +180,14 @@ def process_batch(client: OpenAI, system_prompt: str, batch: list[dict], batch_i
 # ================ Sequential Version ==================
 # ======================================================
 
-def run_batch_inference(input_file: str | Path, output_file: str | Path, prompt_file: str | Path) -> None:
+def run_batch_inference(
+    input_file: str | Path, output_file: str | Path, prompt_file: str | Path
+) -> None:
     """
     Run batch inference sequentially on the specified input file.
+
+    Each finished batch is checkpointed next to the output file, so an interrupted run
+    picks up after the last finished batch when started again.
     """
     input_path = Path(input_file)
     output_path = Path(output_file)
@@ -107,7 +205,7 @@ def run_batch_inference(input_file: str | Path, output_file: str | Path, prompt_
         raise OSError("OPENAI_API_KEY not set in environment or .env file")
 
     client = OpenAI(api_key=api_key)
-    data_items: list[dict] = load_data_items(input_path, DATA_LABEL)
+    data_items: list[dict[str, Any]] = load_data_items(input_path, DATA_LABEL)
     prompt_template: str = load_prompt(prompt_path)
     config = {
         "DATA_LABEL": DATA_LABEL,
@@ -119,9 +217,12 @@ def run_batch_inference(input_file: str | Path, output_file: str | Path, prompt_
 
     print(f"Loaded {len(data_items)} {DATA_LABEL}.")
     print(f"Processing with task: {TASK_DESCRIPTION}")
-    results: list[dict] = []
-    total_items = len(data_items[:100])
+    results: list[dict[str, Any]] = []
+    total_items = len(data_items)
     total_batches = (total_items + BATCH_SIZE - 1) // BATCH_SIZE
+    checkpoint, done = _open_checkpoint(output_path, _run_key(input_path, total_items))
+    if done:
+        print(f"♻️ Resuming: {len(done)}/{total_batches} batches already done")
     start_time = time.time()
     print(f"\n🔹 Processing {total_batches} batches...\n")
     print_progress_bar(
@@ -132,11 +233,18 @@ def run_batch_inference(input_file: str | Path, output_file: str | Path, prompt_
                 batch_time=0,
                 length=40
             )
-    for i in range(0, len(data_items[:100]), BATCH_SIZE):
-        batch: list[dict] = data_items[i : i + BATCH_SIZE]
+    for i in range(0, total_items, BATCH_SIZE):
+        batch: list[dict[str, Any]] = data_items[i : i + BATCH_SIZE]
         batch_id: int = i // BATCH_SIZE + 1
+        if i in done:
+            results.extend(done[i])
+            continue
         batch_start = time.time()
-        filtered: list[dict] = process_batch(client, system_prompt, batch, batch_id)
+        parsed = process_batch(client, system_prompt, batch, batch_id)
+        filtered = _classified_only(_attach_categories(batch, parsed))
+        if filtered:  # nothing classified may be a failed batch; leave it to be retried
+            _append_checkpoint(checkpoint, i, filtered)
+            done[i] = filtered
         results.extend(filtered)
         elapsed = time.time() - start_time
         batch_time = time.time() - batch_start
@@ -151,6 +259,7 @@ def run_batch_inference(input_file: str | Path, output_file: str | Path, prompt_
         )
 
     save_json_file({f"Filtered_{DATA_LABEL}": results}, output_path)
+    _finish_checkpoint(checkpoint, output_path, len(done) == total_batches)
     print(f"✅ Done. Extracted and processed {len(results)} matching {DATA_LABEL} → {output_file}")
 
 
@@ -158,7 +267,9 @@ def run_batch_inference(input_file: str | Path, output_file: str | Path, prompt_
 # ================ Concurrent Version ==================
 # ======================================================
 
-async def process_batch_async(client: AsyncOpenAI, system_prompt: str, batch: list[dict], batch_id: int) -> list[dict]:
+async def process_batch_async(
+    client: AsyncOpenAI, system_prompt: str, batch: list[dict[str, Any]], batch_id: int
+) -> list[dict[str, Any]]:
     """
     Async version of process_batch using AsyncOpenAI.
     """
@@ -187,6 +298,195 @@ async def process_batch_async(client: AsyncOpenAI, system_prompt: str, batch: li
         return []
 
 
+def _build_system_prompt(prompt_file: str | Path) -> str:
+    """Render the system prompt template with the task configuration."""
+    prompt_template: str = load_prompt(Path(prompt_file))
+    config = {
+        "DATA_LABEL": DATA_LABEL,
+        "DATA_DESCRIPTION": DATA_DESCRIPTION,
+        "TASK_DESCRIPTION": TASK_DESCRIPTION,
+        "TASK_INSTRUCTIONS": TASK_INSTRUCTIONS,
+    }
+    return generate_dynamic_prompt(prompt_template, config)
+
+
+_async_client: AsyncOpenAI | None = None
+_system_prompts: dict[str, str] = {}
+
+
+def _get_async_client() -> AsyncOpenAI:
+    """Reuse one AsyncOpenAI client (and its connection pool) across calls."""
+    global _async_client
+    if _async_client is None:
+        load_dotenv()
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise OSError("OPENAI_API_KEY not set in environment or .env file")
+        _async_client = AsyncOpenAI(api_key=api_key)
+    return _async_client
+
+
+def _get_system_prompt(prompt_file: str | Path) -> str:
+    key = str(Path(prompt_file).resolve())
+    if key not in _system_prompts:
+        _system_prompts[key] = _build_system_prompt(prompt_file)
+    return _system_prompts[key]
+
+
+def _query_key(query: object) -> str:
+    """Case- and whitespace-insensitive form of a query, to match the model's echo of it."""
+    return " ".join(str(query).casefold().split())
+
+
+def _attach_categories(
+    batch: list[dict[str, Any]], parsed: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """
+    Copy each input item and add the category the model assigned to it.
+    Results are matched by the query text the model echoes back. Only items whose query
+    the model did not echo recognisably fall back to position, and only when it returned
+    one object per input and that object's query belongs to no other item.
+    Items the model skipped get category None.
+    """
+    parsed = [entry for entry in parsed if isinstance(entry, dict)]
+    by_query = {_query_key(entry.get("query")): entry.get("category") for entry in parsed}
+    batch_keys = [_query_key(item.get("query")) for item in batch]
+    categories = [by_query.get(key) for key in batch_keys]
+    if len(parsed) == len(batch):
+        known = set(batch_keys)
+        for i, key in enumerate(batch_keys):
+            if key not in by_query and _query_key(parsed[i].get("query")) not in known:
+                categories[i] = parsed[i].get("category")
+    return [
+        {**item, "category": category}
+        for item, category in zip(batch, categories, strict=True)
+    ]
+
+
+def _classified_only(classified: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """The items of a classified batch the model gave a category, as written to output files."""
+    return [item for item in classified if item.get("category") is not None]
+
+
+async def _classify_batches(
+    batches: AsyncIterable[tuple[int, list[dict[str, Any]]]],
+    prompt_file: str | Path,
+    concurrency: int,
+) -> AsyncIterator[tuple[int, list[dict[str, Any]]]]:
+    """
+    Classify (batch_id, batch) pairs with up to `concurrency` batches at the model at once,
+    yielding (batch_id, classified batch) as each completes. Batches are pulled only as
+    fast as there are free slots.
+    """
+    client = _get_async_client()
+    system_prompt = _get_system_prompt(prompt_file)
+    running: set[asyncio.Task[tuple[int, list[dict[str, Any]]]]] = set()
+
+    async def run(batch_id: int, batch: list[dict[str, Any]]) -> tuple[int, list[dict[str, Any]]]:
+        parsed = await process_batch_async(client, system_prompt, batch, batch_id)
+        return batch_id, _attach_categories(batch, parsed)
+
+    try:
+        async for batch_id, batch in batches:
+            running.add(asyncio.create_task(run(batch_id, batch)))
+            if len(running) >= concurrency:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        while running:
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in running:
+            task.cancel()
+
+
+async def _slices(
+    items: list[dict[str, Any]], skip: Iterable[int] = ()
+) -> AsyncIterator[tuple[int, list[dict[str, Any]]]]:
+    """(batch_id, batch) pairs of a list, leaving out the batch ids in `skip`."""
+    skipped = set(skip)
+    for i in range(0, len(items), BATCH_SIZE):
+        batch_id = i // BATCH_SIZE + 1
+        if batch_id not in skipped:
+            yield batch_id, items[i : i + BATCH_SIZE]
+
+
+def _print_batch_progress(
+    completed: int, total_batches: int, batch_id: int, start_time: float, total_items: int
+) -> None:
+    items_processed = min(completed * BATCH_SIZE, total_items)
+    print_progress_bar(
+        iteration=completed,
+        total=max(total_batches, 1),
+        prefix=f"Batch {batch_id}/{total_batches}",
+        suffix=f"Elapsed: {time.time() - start_time:.1f}s  Items_Processed: {items_processed}",
+        length=40
+    )
+
+
+async def classify_stream(
+    items: Iterable[dict[str, Any]] | AsyncIterable[dict[str, Any]],
+    prompt_file: str | Path = DEFAULT_PROMPT_FILE,
+    concurrency: int = 10,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """
+    Classify items in memory, yielding each batch of results as soon as it completes.
+
+    Items are grouped into batches of BATCH_SIZE and up to `concurrency` batches are sent to
+    the model at once. Each yielded list holds copies of one batch's input items with a
+    'category' field added (None where the model gave no answer). Batches may complete
+    out of order. Works with plain iterables and async iterators alike, pulling input
+    only as fast as there are free slots.
+    """
+    async def batches() -> AsyncIterator[tuple[int, list[dict[str, Any]]]]:
+        batch: list[dict[str, Any]] = []
+        batch_id = 0
+        if isinstance(items, AsyncIterable):
+            async for item in items:
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    batch_id += 1
+                    yield batch_id, batch
+                    batch = []
+        else:
+            for item in items:
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    batch_id += 1
+                    yield batch_id, batch
+                    batch = []
+        if batch:
+            yield batch_id + 1, batch
+
+    async for _, classified in _classify_batches(batches(), prompt_file, concurrency):
+        yield classified
+
+
+async def classify_items(
+    items: list[dict[str, Any]],
+    prompt_file: str | Path = DEFAULT_PROMPT_FILE,
+    concurrency: int = 10,
+    show_progress: bool = False,
+) -> list[dict[str, Any]]:
+    """
+    Classify a list of items in memory and return them in input order,
+    each copied with a 'category' field added (None where the model gave no answer).
+    """
+    total_batches = (len(items) + BATCH_SIZE - 1) // BATCH_SIZE
+    start_time = time.time()
+    if show_progress:
+        print(f"\n🔹 Processing {total_batches} batches...\n")
+        _print_batch_progress(0, total_batches, 0, start_time, len(items))
+    done: dict[int, list[dict[str, Any]]] = {}
+    async for batch_id, classified in _classify_batches(_slices(items), prompt_file, concurrency):
+        done[batch_id] = classified
+        if show_progress:
+            _print_batch_progress(len(done), total_batches, batch_id, start_time, len(items))
+    return [item for batch_id in sorted(done) for item in done[batch_id]]
+
+
 async def run_batch_inference_concurrently(
     input_file: str | Path,
     output_file: str | Path,
@@ -194,11 +494,13 @@ async def run_batch_inference_concurrently(
     concurrency: int = 10
 ) -> None:
     """
-    Run batch inference concurrently using asyncio for higher throughput.
+    Run batch inference concurrently on the specified input file.
+
+    Batches are classified as classify_items() does them, and each one is checkpointed next
+    to the output file as it finishes, so an interrupted run only redoes unfinished batches.
     """
     input_path = Path(input_file)
     output_path = Path(output_file)
-    prompt_path = Path(prompt_file)
 
     if not validate_json_structure(input_path, DATA_LABEL):
         raise ValueError(
@@ -206,71 +508,32 @@ async def run_batch_inference_concurrently(
             f"Expected a list of items or a dictionary with a list under the '{DATA_LABEL}' key."
         )
 
-    load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise OSError("OPENAI_API_KEY not set in environment or .env file")
-
-    client = AsyncOpenAI(api_key=api_key)
-    data_items: list[dict] = load_data_items(input_path, DATA_LABEL)
-    prompt_template: str = load_prompt(prompt_path)
-    config = {
-        "DATA_LABEL": DATA_LABEL,
-        "DATA_DESCRIPTION": DATA_DESCRIPTION,
-        "TASK_DESCRIPTION": TASK_DESCRIPTION,
-        "TASK_INSTRUCTIONS": TASK_INSTRUCTIONS,
-    }
-    system_prompt: str = generate_dynamic_prompt(prompt_template, config)
+    data_items: list[dict[str, Any]] = load_data_items(input_path, DATA_LABEL)
 
     print(f"Loaded {len(data_items)} {DATA_LABEL}.")
     print(f"Processing with task: {TASK_DESCRIPTION}")
-    
-    results: list[dict] = []
-    total_items = len(data_items[:100])
+
+    total_items = len(data_items)
     total_batches = (total_items + BATCH_SIZE - 1) // BATCH_SIZE
-    semaphore = asyncio.Semaphore(concurrency)
-    progress_lock = asyncio.Lock()        # prevent overlapping prints
-    completed_batches = 0                 # shared atomic progress counter
+    checkpoint, done = _open_checkpoint(output_path, _run_key(input_path, total_items))
+    if done:
+        print(f"♻️ Resuming: {len(done)}/{total_batches} batches already done")
     start_time = time.time()
     print(f"\n🔹 Processing {total_batches} batches...\n")
-    print_progress_bar(
-                    iteration=completed_batches,
-                    total=total_batches,
-                    prefix=f"Batch {0}/{total_batches}",
-                    suffix=f"Elapsed: {0:.1f}s  Items_Processed: {0}",
-                    batch_time=0,
-                    length=40
-                )
-    async def sem_task(batch, batch_id):
-        nonlocal completed_batches
-        async with semaphore:
-            batch_start = time.time()
-            filtered = await process_batch_async(client, system_prompt, batch, batch_id)
-            results.extend(filtered)
-            
-             # Atomic progress update
-            async with progress_lock:
-                completed_batches += 1
-                batch_time = time.time() - batch_start
-                elapsed = time.time() - start_time
-                items_processed = min(completed_batches * BATCH_SIZE, total_items)
-                print_progress_bar(
-                    iteration=completed_batches,
-                    total=total_batches,
-                    prefix=f"Batch {batch_id}/{total_batches}",
-                    suffix=f"Elapsed: {elapsed:.1f}s  Items_Processed: {items_processed}",
-                    batch_time=batch_time,
-                    length=40
-                )
-
-    tasks = []
-    for i in range(0, len(data_items[:100]), BATCH_SIZE):
-        batch = data_items[i : i + BATCH_SIZE]
-        batch_id = i // BATCH_SIZE + 1
-        tasks.append(asyncio.create_task(sem_task(batch, batch_id)))
-
-    await asyncio.gather(*tasks)
+    _print_batch_progress(len(done), total_batches, 0, start_time, total_items)
+    finished = {start // BATCH_SIZE + 1 for start in done}
+    batches = _slices(data_items, skip=finished)
+    async for batch_id, classified in _classify_batches(batches, prompt_file, concurrency):
+        kept = _classified_only(classified)
+        if kept:  # nothing classified is a failed batch; leave it to be retried
+            start = (batch_id - 1) * BATCH_SIZE
+            _append_checkpoint(checkpoint, start, kept)
+            done[start] = kept
+        _print_batch_progress(len(done), total_batches, batch_id, start_time, total_items)
+
+    results = [item for start in sorted(done) for item in done[start]]
     save_json_file({f"Filtered_{DATA_LABEL}": results}, output_path)
+    _finish_checkpoint(checkpoint, output_path, len(done) == total_batches)
     print(f"✅ Done. Extracted and processed {len(results)} matching {DATA_LABEL} → {output_file}")
 
 
@@ -283,6 +546,8 @@ if __name__ == "__main__":
     mode = sys.argv[1] if len(sys.argv) > 1 else "sequential"
 
     if mode == "concurrent":
-        asyncio.run(run_batch_inference_concurrently(INPUT_FILE, OUTPUT_FILE, PROMPT_FILE, concurrency=10))
+        asyncio.run(
+            run_batch_inference_concurrently(INPUT_FILE, OUTPUT_FILE, PROMPT_FILE, concurrency=10)
+        )
     else:
         run_batch_inference(INPUT_FILE, OUTPUT_FILE, PROMPT_FILE)
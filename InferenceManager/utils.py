@@ -16,7 +16,7 @@ def save_json_file(data: JSONData, path: Path) -> None:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
 
-def load_data_items(path: Path, data_label: str) -> list[dict]:
+def load_data_items(path: Path, data_label: str) -> list[dict[str, Any]]:
     """
     Load data from a JSON file based on the specified data label.
     The file should contain either:
@@ -28,7 +28,7 @@ def load_data_items(path: Path, data_label: str) -> list[dict]:
     data = load_json_file(path)
     if isinstance(data, dict):
         if data_label in data and isinstance(data[data_label], list):
-            return data[data_label]  # keep objects as-is
+            return cast(list[dict[str, Any]], data[data_label])  # keep objects as-is
         raise ValueError(
             f"Expected JSON with a list under the key '{data_label}'. "
             f"Found keys: {list(data.keys())}"
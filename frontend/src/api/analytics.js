@@ -15,3 +15,18 @@ export async function fetchAnalytics(period = 'day') {
     return []
   }
 }
+
+export async function fetchAnalyticsSummary() {
+  try {
+    const backendUrl = getBackendUrl()
+    if (!backendUrl) {
+      throw new Error('Backend URL not configured')
+    }
+    const res = await fetch(`${backendUrl}/analytics/summary`)
+    if (!res.ok) throw new Error(`Failed to fetch analytics summary: ${res.status}`)
+    return await res.json()
+  } catch (err) {
+    console.error(err)
+    return null
+  }
+}
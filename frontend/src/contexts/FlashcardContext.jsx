@@ -6,7 +6,7 @@ import { useConfig } from "../hooks/useConfig";
 const FlashcardContext = createContext(null)
 
 export function FlashcardProvider({ children }) {
-  const [cache, setCache] = useState({}) // { category: { batch: [], entryIdx: 0, hasLooped: false } }
+  const [cache, setCache] = useState({}) // { category: { batch: [], entryIdx: 0, hasLooped: false, nextCursor: null } }
   const [currentCategory, setCurrentCategory] = useState('Lexis')
   const [loading, setLoading] = useState(false)
   const { backendUrl } = useConfig();
@@ -20,13 +20,15 @@ export function FlashcardProvider({ children }) {
     }
     setLoading(true)
     try {
+      // Each category keeps its own server-side position, so the next fetch continues where this one stopped
+      const nextCursor = forceRefresh ? null : (cache[category]?.nextCursor ?? null)
       const res = await axios.get(`${backendUrl}/random-query`, {
-        params: { category, limit: LIMIT, force_refresh: forceRefresh }
+        params: { category, limit: LIMIT, force_refresh: forceRefresh, ...(nextCursor ? { cursor: nextCursor } : {}) }
       })
       const newBatch = Array.isArray(res.data) ? res.data : (res.data.queries ?? [])
       setCache(prev => ({
         ...prev,
-        [category]: { batch: newBatch, entryIdx: 0, hasLooped: false , maxClockWiseCursor : 0, minAntiClockWiseCursor : 0, cursor : 0 }
+        [category]: { batch: newBatch, entryIdx: 0, hasLooped: false , maxClockWiseCursor : 0, minAntiClockWiseCursor : 0, cursor : 0, nextCursor: res.headers['x-next-cursor'] ?? null }
       }))
     } catch (err) {
       console.error('fetchBatch error', err)
@@ -1,24 +1,35 @@
 import React, { useState, useEffect } from 'react'
 import Chart from '../components/Chart'
 import TimeframeSelector from '../components/TimeframeSelector'
-import { fetchAnalytics } from '../api/analytics'
+import { fetchAnalyticsSummary } from '../api/analytics'
 
 export default function Dashboard() {
   const [period, setPeriod] = useState('day')
+  const [summary, setSummary] = useState(null)
   const [data, setData] = useState([])
 
+  // One request fills every timeframe, so a switch renders the copy already loaded at once.
+  // The summary is still re-fetched on every switch so the numbers never go stale; the
+  // server answers 304 from its cache when nothing changed.
   useEffect(() => {
-    fetchAnalytics(period).then(res => {
-      const dataArray = Object.entries(res.category_distribution || {}).map(
-        ([category, num_of_search_queries]) => ({
-          category,
-          value: num_of_search_queries
-        })
-      )
-      setData(dataArray)
+    let cancelled = false
+    fetchAnalyticsSummary().then(res => {
+      if (res && !cancelled) setSummary(res)
     }).catch(err => console.error("Failed to fetch analytics:", err))
+    return () => { cancelled = true }
   }, [period])
 
+  useEffect(() => {
+    const res = summary?.periods?.[period] || {}
+    const dataArray = Object.entries(res.category_distribution || {}).map(
+      ([category, num_of_search_queries]) => ({
+        category,
+        value: num_of_search_queries
+      })
+    )
+    setData(dataArray)
+  }, [period, summary])
+
   return (
     <div className="dashboard-container">
       <TimeframeSelector selected={period} onChange={setPeriod} />
@@ -0,0 +1,77 @@
+import json
+import os
+from collections.abc import Awaitable, Callable, Iterator
+from pathlib import Path
+from types import ModuleType
+from typing import Any, TypeVar
+
+import pytest
+from fastapi.testclient import TestClient
+
+from Backend.backfill import BackfillJob
+from Backend.google_snapshot import browser_pool
+
+T = TypeVar("T")
+
+# Backend.main validates these at import/startup; the model is never called in tests
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("MODEL_NAME", "test-model")
+os.environ.setdefault("MYACTIVITY_JSON_FILE", "MyActivity.json")
+
+
+def keyword_category(query: str) -> str | None:
+    """Stand-in for the model: "define ..." is Lexis, "unknowable ..." gets no answer."""
+    if query.startswith("unknowable"):
+        return None
+    return "Lexis" if query.startswith("define") else "Science"
+
+
+@pytest.fixture
+def backend(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ModuleType:
+    """Backend.main configured against a fresh DB in tmp_path, with a fake model."""
+    import Backend.main as main
+
+    activity = tmp_path / "MyActivity.json"
+    activity.write_text("[]", encoding="utf-8")
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'usage.db'}")
+    monkeypatch.setenv("MYACTIVITY_JSON_FILE", str(activity))
+    monkeypatch.setenv("TAKEOUT_BACKFILL", "0")
+    monkeypatch.setattr(main, "MYACTIVITY_JSON_FILE", str(activity))
+    monkeypatch.setattr(main, "SNAPSHOT_CACHE_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(main, "DEVICE_CACHE", {})
+    monkeypatch.setattr(main, "MAX_WAIT_TIME", 0.05)
+    monkeypatch.setattr(main, "backfill_job", BackfillJob())
+
+    async def classify_items(
+        items: list[dict[str, Any]],
+        prompt_file: object = None,  # noqa: ARG001
+        concurrency: int = 10,  # noqa: ARG001
+        show_progress: bool = False,  # noqa: ARG001
+    ) -> list[dict[str, Any]]:
+        return [{**item, "category": keyword_category(item["query"])} for item in items]
+
+    async def no_browser() -> None:
+        return None
+
+    monkeypatch.setattr(main, "classify_items", classify_items)
+    monkeypatch.setattr(browser_pool, "start", no_browser)
+    return main
+
+
+@pytest.fixture
+def client(backend: ModuleType) -> Iterator[TestClient]:
+    with TestClient(backend.app) as client:
+        yield client
+
+
+def write_activity(path: str | Path, queries: list[tuple[str, str]]) -> None:
+    """Write a Takeout MyActivity.json with one "Searched for" entry per (query, time)."""
+    entries = [{"title": f"Searched for {query}", "time": time} for query, time in queries]
+    Path(path).write_text(json.dumps(entries), encoding="utf-8")
+
+
+def on_app_loop(client: TestClient, fn: Callable[..., Awaitable[T]], *args: object) -> T:  # noqa: UP047
+    """Run a coroutine function on the app's event loop, where the backend's state lives."""
+    assert client.portal is not None
+    result: T = client.portal.call(fn, *args)
+    return result
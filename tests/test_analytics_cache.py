@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+
+import pytest
+
+
+@pytest.fixture
+def cache(backend: ModuleType, monkeypatch: pytest.MonkeyPatch) -> ModuleType:
+    monkeypatch.setattr(backend, "ANALYTICS_CACHE", type(backend.ANALYTICS_CACHE)())
+    monkeypatch.setattr(backend, "ANALYTICS_CACHE_MAX_ENTRIES", 8)
+    return backend
+
+
+def test_concurrent_stores_keep_the_cache_bounded(cache: ModuleType) -> None:
+    def store(worker: int) -> None:
+        for i in range(500):
+            cache._store_analytics(("k", worker, i % 20), {"i": i}, 0)
+            cache._cached_analytics(("k", worker, (i + 7) % 20))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(store, range(8)))
+    assert len(cache.ANALYTICS_CACHE) == 8
+
+
+def test_least_recently_used_entry_is_evicted(cache: ModuleType) -> None:
+    for i in range(8):
+        cache._store_analytics(("k", i), i, 0)
+    assert cache._cached_analytics(("k", 0)) is not None
+    cache._store_analytics(("k", 8), 8, 0)
+    assert ("k", 0) in cache.ANALYTICS_CACHE
+    assert ("k", 1) not in cache.ANALYTICS_CACHE
+
+
+def test_older_generation_does_not_replace_newer_result(cache: ModuleType) -> None:
+    newer = cache._store_analytics(("summary",), {"n": 2}, 2)
+    assert cache._store_analytics(("summary",), {"n": 1}, 1) == newer
+    assert cache._cached_analytics(("summary",)) == newer
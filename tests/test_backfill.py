@@ -0,0 +1,57 @@
+import time
+from types import ModuleType
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from Backend.backfill import BackfillJob
+from tests.conftest import write_activity
+
+
+def test_total_is_estimated_from_the_share_of_the_file_read() -> None:
+    job = BackfillJob()
+    assert job.progress()["total"] is None
+    job.begin(0, 0, bytes_total=1000)
+    job.read(250)
+    job.advance(100, 90)
+    progress = job.progress()
+    assert (progress["total"], progress["total_is_estimate"]) == (400, True)
+    assert progress["percent"] == 25.0
+
+
+def wait_for_backfill(client: TestClient) -> dict[str, Any]:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        progress: dict[str, Any] = client.get("/import/backfill").json()
+        if progress["state"] not in ("starting", "running"):
+            return progress
+        time.sleep(0.05)
+    raise AssertionError("backfill did not finish")
+
+
+def history(backend: ModuleType, n: int) -> None:
+    write_activity(
+        backend.MYACTIVITY_JSON_FILE,
+        [(f"define word{i}", f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}Z") for i in range(n)],
+    )
+
+
+def test_backfill_turned_off_waits_for_an_explicit_start(backend: ModuleType) -> None:
+    history(backend, 30)
+    with TestClient(backend.app) as client:
+        assert client.get("/import/backfill").json()["state"] == "idle"
+        assert client.post("/import/backfill/start").status_code == 200
+        progress = wait_for_backfill(client)
+    assert progress["state"] == "done"
+    assert (progress["total"], progress["done"], progress["stored"]) == (30, 30, 30)
+    assert progress["total_is_estimate"] is False
+
+
+def test_backfill_starts_at_startup_by_default(
+    backend: ModuleType, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv("TAKEOUT_BACKFILL")
+    history(backend, 5)
+    with TestClient(backend.app) as client:
+        assert wait_for_backfill(client)["stored"] == 5
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from typing import Any
+
+from Backend.batcher import BatchScheduler
+
+
+class Recorder:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.started = time.monotonic()
+        self.batches: list[tuple[float, list[Any]]] = []
+
+    async def __call__(self, batch: list[Any]) -> None:
+        self.batches.append((time.monotonic() - self.started, batch))
+        await asyncio.sleep(self.delay)
+
+
+def test_full_batch_is_flushed_without_waiting() -> None:
+    async def run() -> Recorder:
+        handler = Recorder()
+        scheduler = BatchScheduler(handler, max_batch_size=3, max_wait=10)
+        scheduler.start()
+        scheduler.submit_many([1, 2, 3])
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return handler
+
+    handler = asyncio.run(run())
+    assert [batch for _, batch in handler.batches] == [[1, 2, 3]]
+
+
+def test_partial_batch_is_flushed_after_max_wait() -> None:
+    async def run() -> Recorder:
+        handler = Recorder()
+        scheduler = BatchScheduler(handler, max_batch_size=10, max_wait=0.1)
+        scheduler.start()
+        scheduler.submit(1)
+        await asyncio.sleep(0.05)
+        assert handler.batches == []
+        await asyncio.sleep(0.15)
+        await scheduler.stop()
+        return handler
+
+    handler = asyncio.run(run())
+    assert [batch for _, batch in handler.batches] == [[1]]
+
+
+def test_leftovers_keep_their_enqueue_time() -> None:
+    # One slot, slow handler: [3, 4] waits for the slot until 0.6s and leaves 5 behind.
+    # 5 was queued at ~0s, so it is overdue by the time the slot frees up again at 1.2s;
+    # restarting its wait when [3, 4] was taken would hold it until 1.4s.
+    async def run() -> Recorder:
+        handler = Recorder(delay=0.6)
+        scheduler = BatchScheduler(handler, max_batch_size=2, max_wait=0.8, max_in_flight=1)
+        scheduler.start()
+        scheduler.submit_many([1, 2])
+        await asyncio.sleep(0.01)
+        scheduler.submit_many([3, 4, 5])
+        await asyncio.sleep(1.5)
+        await scheduler.stop()
+        return handler
+
+    handler = asyncio.run(run())
+    assert [batch for _, batch in handler.batches] == [[1, 2], [3, 4], [5]]
+    assert handler.batches[2][0] < 1.3
+
+
+def test_stop_with_drain_flushes_waiting_items() -> None:
+    async def run() -> Recorder:
+        handler = Recorder()
+        scheduler = BatchScheduler(handler, max_batch_size=2, max_wait=10)
+        scheduler.start()
+        scheduler.submit(1)
+        await scheduler.stop(timeout=1, drain=True)
+        return handler
+
+    handler = asyncio.run(run())
+    assert [batch for _, batch in handler.batches] == [[1]]
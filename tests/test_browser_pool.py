@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from Backend.google_snapshot import BrowserPool
+
+
+class FakePage:
+    def __init__(self, context: "FakeContext") -> None:
+        self.context = context
+        self.closed = False
+
+    async def goto(self, url: str, timeout: int) -> None:  # noqa: ARG002
+        if "broken" in url:
+            raise TimeoutError("navigation timed out")
+        self.context.active += 1
+        self.context.peak = max(self.context.peak, self.context.active)
+        await asyncio.sleep(0.01)
+        self.context.active -= 1
+
+    async def wait_for_timeout(self, ms: int) -> None:  # noqa: ARG002
+        return None
+
+    async def screenshot(self, type: str = "png", **kwargs: object) -> bytes:  # noqa: ARG002
+        return type.encode()
+
+    async def content(self) -> str:
+        return "<html></html>"
+
+    async def close(self) -> None:
+        self.closed = True
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+
+class FakeContext:
+    def __init__(self) -> None:
+        self.pages: list[FakePage] = []
+        self.active = 0
+        self.peak = 0
+
+    async def new_page(self) -> FakePage:
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+
+@pytest.fixture
+def context() -> FakeContext:
+    return FakeContext()
+
+
+def make_pool(context: FakeContext, size: int = 2, max_uses: int = 50) -> BrowserPool:
+    pool = BrowserPool(size=size, max_uses_per_page=max_uses)
+    pool._context = context  # type: ignore[assignment]
+
+    async def started() -> None:
+        return None
+
+    pool.start = started  # type: ignore[method-assign]
+    return pool
+
+
+def test_pages_are_reused_until_max_uses(context: FakeContext) -> None:
+    pool = make_pool(context, size=1, max_uses=3)
+
+    async def scenario() -> None:
+        for i in range(7):
+            assert await pool.render(f"q{i}") == (b"png", b"jpeg", "<html></html>")
+
+    asyncio.run(scenario())
+    assert len(context.pages) == 3
+    assert [page.closed for page in context.pages] == [True, True, False]
+
+
+def test_failed_render_replaces_the_page(context: FakeContext) -> None:
+    pool = make_pool(context, size=1)
+
+    async def scenario() -> None:
+        await pool.render("fine")
+        with pytest.raises(TimeoutError):
+            await pool.render("broken")
+        await pool.render("fine again")
+
+    asyncio.run(scenario())
+    assert len(context.pages) == 2
+    assert context.pages[0].closed and not context.pages[1].closed
+
+
+def test_renders_at_once_are_capped_at_pool_size(context: FakeContext) -> None:
+    pool = make_pool(context, size=2)
+
+    async def scenario() -> None:
+        await asyncio.gather(*(pool.render(f"q{i}") for i in range(8)))
+
+    asyncio.run(scenario())
+    assert context.peak == 2
+    assert len(context.pages) == 2
@@ -0,0 +1,93 @@
+import json
+import time
+from collections.abc import Iterator
+from types import ModuleType
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, func, select
+
+
+def event(query: str, device_id: int, timestamp: str = "2025-10-01T10:00:00Z") -> dict[str, object]:
+    return {"query": query, "timestamp": timestamp, "device_id": device_id}
+
+
+def register_device(client: TestClient) -> int:
+    response = client.post(
+        "/devices/",
+        json={"platform": "Linux", "browser": "Firefox", "device_name": "pc", "user_name": "me"},
+    )
+    return int(response.json()["device_id"])
+
+
+def stored_events(backend: ModuleType) -> int:
+    with Session(backend.engine) as session:
+        return int(session.exec(select(func.count()).select_from(backend.SearchEvent)).one())
+
+
+def test_ndjson_lines_are_validated_and_stored(backend: ModuleType, client: TestClient) -> None:
+    device_id = register_device(client)
+    lines = [
+        json.dumps(event("define idle", device_id)),
+        "{broken",
+        json.dumps(event("black holes", 999)),
+        json.dumps(event("dark matter", device_id, "yesterday")),
+        json.dumps(event("black holes", device_id)),
+    ]
+    response = client.post("/events/bulk", content="\n".join(lines))
+    body = response.json()
+    assert (body["status"], body["accepted"], body["rejected"]) == ("queued", 2, 3)
+    assert [error["index"] for error in body["errors"]] == [1, 2, 3]
+
+    deadline = time.monotonic() + 5
+    while stored_events(backend) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert stored_events(backend) == 2
+
+
+def test_json_array_body_streamed_in_pieces(client: TestClient) -> None:
+    device_id = register_device(client)
+    events = [event(f"define word{i}", device_id) for i in range(50)]
+    payload = json.dumps(events).encode()
+
+    def pieces() -> Iterator[bytes]:
+        for i in range(0, len(payload), 7):
+            yield payload[i : i + 7]
+
+    body = client.post("/events/bulk", content=pieces()).json()
+    assert (body["status"], body["accepted"], body["rejected"]) == ("queued", 50, 0)
+
+
+def test_truncated_array_keeps_items_before_the_error(client: TestClient) -> None:
+    device_id = register_device(client)
+    truncated = "[" + json.dumps(event("define a", device_id)) + ", {"
+    body = client.post("/events/bulk", content=truncated).json()
+    assert (body["status"], body["accepted"]) == ("error", 1)
+
+
+def test_failed_write_is_retried(
+    backend: ModuleType, client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    insert = backend._insert_search_events
+    calls = 0
+
+    def locked_once(session: Session, rows: list[dict[str, Any]]) -> list[tuple[str, int, str]]:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        result: list[tuple[str, int, str]] = insert(session, rows)
+        return result
+
+    monkeypatch.setattr(backend, "_insert_search_events", locked_once)
+    monkeypatch.setattr(backend, "RETRY_BASE_DELAY", 0.05)
+    device_id = register_device(client)
+    body = client.post("/events/bulk", content=json.dumps(event("define idle", device_id))).json()
+    assert body["accepted"] == 1
+
+    deadline = time.monotonic() + 5
+    while stored_events(backend) < 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert (calls, stored_events(backend)) == (2, 1)
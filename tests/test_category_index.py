@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from Backend.category_index import CategoryIndex
+
+
+def test_out_of_order_ids_are_inserted_in_place() -> None:
+    index = CategoryIndex()
+    index.extend([("Science", 1, "a"), ("Science", 5, "e")])
+    index.extend([("Science", 3, "c"), ("Science", 2, "b")])
+    index.add("Science", 4, "d")
+    assert index.page_after("Science", 0, 10) == [(1, "a"), (2, "b"), (3, "c"), (4, "d"), (5, "e")]
+    assert [index.entry_at("Science", i) for i in range(5)] == index.page_after("Science", 0, 5)
+    assert index.last_id("Science") == 5
+
+
+def test_known_ids_are_ignored() -> None:
+    index = CategoryIndex()
+    index.extend([("Lexis", 1, "a"), ("Lexis", 2, "b"), ("Lexis", 3, "c")])
+    index.extend([("Lexis", 2, "b"), ("Lexis", 3, "c"), ("Lexis", 1, "a")])
+    assert index.counts() == {"Lexis": 3}
+    assert len(index) == 3
+
+
+def test_pages_and_sizes() -> None:
+    index = CategoryIndex()
+    index.extend(("Science", i, f"q{i}") for i in range(1, 8))
+    assert index.page_after("Science", 3, 2) == [(4, "q4"), (5, "q5")]
+    assert index.page_after("Science", 7, 2) == []
+    assert index.page_after("History", 0, 2) == []
+    assert (index.size("Science"), index.size("History")) == (7, 0)
+    assert index.last_id("History") is None
+
+
+def test_interleaved_writers_keep_every_id_once() -> None:
+    index = CategoryIndex()
+
+    def write(offset: int) -> None:
+        # each writer commits its own ids, interleaved with the others'
+        index.extend(("Science", i, f"q{i}") for i in range(offset, 4000, 4))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(write, [3, 1, 2, 0]))
+    page = index.page_after("Science", -1, 5000)
+    assert [event_id for event_id, _ in page] == list(range(4000))
+    assert all(query == f"q{event_id}" for event_id, query in page)
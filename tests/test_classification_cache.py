@@ -0,0 +1,82 @@
+import threading
+import time
+from types import ModuleType
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from tests.conftest import on_app_loop
+
+
+@pytest.fixture
+def model_calls(backend: ModuleType, monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    """Queries sent to the (fake) model, one list per call."""
+    calls: list[list[str]] = []
+    classify_items = backend.classify_items
+
+    async def counting(
+        items: list[dict[str, Any]], *args: object, **kwargs: object
+    ) -> list[dict[str, Any]]:
+        calls.append([item["query"] for item in items])
+        result: list[dict[str, Any]] = await classify_items(items, *args, **kwargs)
+        return result
+
+    monkeypatch.setattr(backend, "classify_items", counting)
+    return calls
+
+
+def test_repeat_queries_skip_the_model(
+    backend: ModuleType, client: TestClient, model_calls: list[list[str]]
+) -> None:
+    records = [{"query": "Black holes?", "timestamp": "2025-10-01T10:00:00Z"}]
+    assert on_app_loop(client, backend._import_records, records, 1) == 1
+    assert model_calls == [["Black holes?"]]
+
+    results = on_app_loop(client, backend.classify_events, [{"query": "black   HOLES"}])
+    assert [(r["category"], r["category_source"]) for r in results] == [("Science", "cache")]
+    assert len(model_calls) == 1
+
+
+def test_duplicates_within_a_batch_are_sent_once(
+    backend: ModuleType, client: TestClient, model_calls: list[list[str]]
+) -> None:
+    events = [{"query": "Quasars"}, {"query": "quasars!"}, {"query": "pulsars"}]
+    results = on_app_loop(client, backend.classify_events, events)
+    assert [result["category"] for result in results] == ["Science"] * 3
+    assert model_calls == [["Quasars", "pulsars"]]
+
+
+@pytest.mark.usefixtures("client")
+def test_only_model_and_rule_labels_train_the_local_classifier(backend: ModuleType) -> None:
+    entries = [
+        {"query": "define idle", "category": "Lexis", "category_source": "rule"},
+        {"query": "black holes", "category": "Science", "category_source": "llm"},
+        {"query": "quasar mass", "category": "Science", "category_source": "local"},
+    ]
+    with Session(backend.engine) as session:
+        backend._cache_categories(session, entries)
+        session.commit()
+    backend.train_local_classifier()
+    assert backend.local_classifier.n_samples == 2
+
+
+def test_startup_does_not_wait_for_the_local_classifier(
+    backend: ModuleType, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    release = threading.Event()
+    trained: list[bool] = []
+
+    def slow_training() -> None:
+        release.wait(5)
+        trained.append(True)
+
+    monkeypatch.setattr(backend, "train_local_classifier", slow_training)
+    with TestClient(backend.app):
+        assert trained == []
+        release.set()
+        deadline = time.monotonic() + 5
+        while not trained and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert trained == [True]
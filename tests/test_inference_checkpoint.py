@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from InferenceManager import runInferenceInBatches as runner
+
+RUN = {"input": "queries.json", "items": 4, "batch_size": 2}
+
+
+def write_checkpoint(output: Path, lines: list[str]) -> Path:
+    path = runner._checkpoint_path(output)
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+    return path
+
+
+def batch(start: int) -> str:
+    return json.dumps({"start": start, "results": [{"query": f"q{start}"}]})
+
+
+def test_resume_keeps_intact_batches_and_drops_a_torn_line(tmp_path: Path) -> None:
+    output = tmp_path / "out.json"
+    path = write_checkpoint(output, [json.dumps(RUN), batch(0), '{"start": 2, "resu'])
+    f, done = runner._open_checkpoint(output, RUN)
+    runner._append_checkpoint(f, 2, [{"query": "q2"}])
+    f.close()
+    assert done == {0: [{"query": "q0"}]}
+    assert path.read_text(encoding="utf-8").splitlines() == [json.dumps(RUN), batch(0), batch(2)]
+
+
+def test_checkpoint_of_another_run_is_discarded(tmp_path: Path) -> None:
+    output = tmp_path / "out.json"
+    write_checkpoint(output, [json.dumps({**RUN, "items": 5}), batch(0)])
+    f, done = runner._open_checkpoint(output, RUN)
+    f.close()
+    assert done == {}
+
+
+def test_failed_rewrite_leaves_the_old_checkpoint(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    output = tmp_path / "out.json"
+    lines = [json.dumps(RUN), batch(0), batch(2)]
+    path = write_checkpoint(output, lines)
+
+    def crash(*args: object) -> None:  # noqa: ARG001
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        runner._open_checkpoint(output, RUN)
+    assert path.read_text(encoding="utf-8").splitlines() == lines
+
+
+def test_categories_follow_the_echoed_query_not_the_position() -> None:
+    batch = [{"query": "Weather Dublin"}, {"query": "python  asyncio"}]
+    parsed = [
+        {"query": "python asyncio", "category": "Programming"},
+        {"query": "weather dublin", "category": "Weather"},
+    ]
+    assert runner._attach_categories(batch, parsed) == [
+        {"query": "Weather Dublin", "category": "Weather"},
+        {"query": "python  asyncio", "category": "Programming"},
+    ]
+
+
+def test_unmatched_echo_falls_back_to_position() -> None:
+    batch = [{"query": "cafe menu"}, {"query": "bus times"}]
+    parsed = [
+        {"query": "café menu", "category": "Food"},
+        {"query": "bus times", "category": "Travel"},
+    ]
+    assert [item["category"] for item in runner._attach_categories(batch, parsed)] == [
+        "Food",
+        "Travel",
+    ]
+    assert [item["category"] for item in runner._attach_categories(batch, parsed[1:])] == [
+        None,
+        "Travel",
+    ]
+
+
+def answer(batch: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Stand-in for the model: answers out of order and skips "fail" queries."""
+    return [
+        {"query": item["query"], "category": "Science"}
+        for item in reversed(batch)
+        if item["query"] != "fail"
+    ]
+
+
+@pytest.fixture
+def offline(monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    """Both runners wired to the fake model; returns the queries sent per batch."""
+    sent: list[list[str]] = []
+
+    def process_batch(
+        client: object, system_prompt: str, batch: list[dict[str, Any]], batch_id: int  # noqa: ARG001
+    ) -> list[dict[str, Any]]:
+        sent.append([item["query"] for item in batch])
+        return answer(batch)
+
+    async def process_batch_async(
+        client: object, system_prompt: str, batch: list[dict[str, Any]], batch_id: int
+    ) -> list[dict[str, Any]]:
+        return process_batch(client, system_prompt, batch, batch_id)
+
+    monkeypatch.setattr(runner, "BATCH_SIZE", 2)
+    monkeypatch.setattr(runner, "process_batch", process_batch)
+    monkeypatch.setattr(runner, "process_batch_async", process_batch_async)
+    monkeypatch.setattr(runner, "_get_async_client", lambda: None)
+    monkeypatch.setattr(runner, "_get_system_prompt", lambda prompt_file: "")  # noqa: ARG005
+    return sent
+
+
+def run(concurrent: bool, input_file: Path, output: Path) -> None:
+    prompt_file = runner.DEFAULT_PROMPT_FILE
+    if concurrent:
+        asyncio.run(runner.run_batch_inference_concurrently(input_file, output, prompt_file))
+    else:
+        runner.run_batch_inference(input_file, output, prompt_file)
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_runs_checkpoint_classified_items_and_resume_failed_batches(
+    tmp_path: Path, offline: list[list[str]], concurrent: bool
+) -> None:
+    input_file, output = tmp_path / "queries.json", tmp_path / "out.json"
+    input_file.write_text(json.dumps({"queries": [
+        {"query": "a", "n": 1}, {"query": "b", "n": 2}, {"query": "fail", "n": 3}
+    ]}), encoding="utf-8")
+    run(concurrent, input_file, output)
+    lines = runner._checkpoint_path(output).read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[1]) == {"start": 0, "results": [
+        {"query": "a", "n": 1, "category": "Science"},
+        {"query": "b", "n": 2, "category": "Science"},
+    ]}
+    assert len(lines) == 2
+
+    offline.clear()
+    run(concurrent, input_file, output)
+    assert offline == [["fail"]]
+
+
+def test_run_key_changes_with_the_input_content(tmp_path: Path) -> None:
+    input_file = tmp_path / "queries.json"
+    input_file.write_text('{"queries": [{"query": "a"}]}', encoding="utf-8")
+    before = runner._run_key(input_file, 1)
+    input_file.write_text('{"queries": [{"query": "b"}]}', encoding="utf-8")
+    assert runner._run_key(input_file, 1) != before
@@ -0,0 +1,49 @@
+import numpy as np
+
+from Backend.local_classifier import HashedNaiveBayes
+
+CATEGORIES = ["Lexis", "Science", "History"]
+SAMPLES = [
+    ("meaning of serendipity", "Lexis"),
+    ("synonym for happy", "Lexis"),
+    ("definition of ephemeral", "Lexis"),
+    ("black hole radiation", "Science"),
+    ("photosynthesis light reaction", "Science"),
+    ("speed of light in vacuum", "Science"),
+]
+
+
+def fitted() -> HashedNaiveBayes:
+    model = HashedNaiveBayes(CATEGORIES, n_features=2**12)
+    model.partial_fit(SAMPLES)
+    return model
+
+
+def test_predicts_the_trained_class() -> None:
+    model = fitted()
+    assert model.predict("meaning of ephemeral")[0] == "Lexis"
+    assert model.predict("black hole light")[0] == "Science"
+
+
+def test_abstains_without_known_features() -> None:
+    assert fitted().predict("zxqv wplk") == (None, 0.0)
+    assert HashedNaiveBayes(CATEGORIES).predict("anything") == (None, 0.0)
+
+
+def test_unknown_categories_are_ignored() -> None:
+    model = HashedNaiveBayes(CATEGORIES, n_features=2**12)
+    assert model.partial_fit([("a query", "Nope"), ("another query", "Lexis")]) == 1
+
+
+def test_incremental_refresh_matches_full_recompute() -> None:
+    model = fitted()
+    model.predict("warm up")  # refreshes everything trained so far
+    untouched = model._log_likelihood[CATEGORIES.index("Lexis")].copy()
+    model.partial_fit([("newton laws of motion", "Science")])
+    assert model._dirty == {CATEGORIES.index("Science")}
+    model.refresh()
+
+    smoothed = model.feature_counts + model.alpha
+    expected = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+    np.testing.assert_allclose(model._log_likelihood, expected, rtol=1e-5)
+    np.testing.assert_array_equal(model._log_likelihood[CATEGORIES.index("Lexis")], untouched)
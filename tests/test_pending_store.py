@@ -0,0 +1,87 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from Backend.pending_store import PendingEventStore
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> PendingEventStore:
+    engine = create_engine(f"sqlite:///{tmp_path / 'pending.db'}")
+    SQLModel.metadata.create_all(engine)
+    return PendingEventStore(engine, commit_interval=0.01)
+
+
+def test_append_returns_ids_in_order(store: PendingEventStore) -> None:
+    async def run() -> list[int]:
+        return await store.append_many([{"query": "a"}, {"query": "b"}, {"query": "c"}])
+
+    ids = asyncio.run(run())
+    assert ids == sorted(ids)
+    assert [event["query"] for _, event in store.load_unprocessed()] == ["a", "b", "c"]
+
+
+def test_append_during_commit_is_committed(store: PendingEventStore) -> None:
+    # The second append arrives while the first group is being written
+    insert = store._insert
+
+    def slow_insert(rows: list[dict[str, Any]]) -> list[int]:
+        time.sleep(0.1)
+        return insert(rows)
+
+    store._insert = slow_insert  # type: ignore[method-assign]
+
+    async def run() -> tuple[int, int]:
+        first = asyncio.create_task(store.append({"query": "first"}))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(store.append({"query": "second"}))
+        return await asyncio.wait_for(asyncio.gather(first, second), timeout=2)
+
+    first_id, second_id = asyncio.run(run())
+    assert first_id < second_id
+    assert store.count() == 2
+
+
+def test_concurrent_appends_share_a_commit(store: PendingEventStore) -> None:
+    calls: list[int] = []
+    insert = store._insert
+
+    def counting_insert(rows: list[dict[str, Any]]) -> list[int]:
+        calls.append(len(rows))
+        return insert(rows)
+
+    store._insert = counting_insert  # type: ignore[method-assign]
+
+    async def run() -> list[int]:
+        return await asyncio.gather(*(store.append({"query": str(i)}) for i in range(20)))
+
+    ids = asyncio.run(run())
+    assert len(set(ids)) == 20
+    assert calls == [20]
+
+
+def test_mark_processed_removes_rows(store: PendingEventStore) -> None:
+    ids = asyncio.run(store.append_many([{"query": "a"}, {"query": "b"}]))
+    with Session(store.engine) as session:
+        PendingEventStore.mark_processed(session, ids[:1])
+        session.commit()
+    assert [pending_id for pending_id, _ in store.load_unprocessed()] == ids[1:]
+
+
+def test_failed_rows_are_retried_until_dead_lettered(store: PendingEventStore) -> None:
+    ids = asyncio.run(store.append_many([{"query": "a"}, {"query": "b"}]))
+    assert store.record_failure(ids, "no category", max_attempts=2) == {ids[0]: 1, ids[1]: 1}
+    assert store.record_failure(ids[:1], "no category", max_attempts=2) == {}
+    assert [pending_id for pending_id, _ in store.load_unprocessed()] == ids[1:]
+    assert (store.count(), store.count_dead()) == (1, 1)
+
+
+def test_dead_letter_skips_retries(store: PendingEventStore) -> None:
+    ids = asyncio.run(store.append_many([{"query": "a", "timestamp": "garbage"}]))
+    store.dead_letter(ids, "invalid timestamp")
+    assert store.load_unprocessed() == []
+    assert store.count_dead() == 1
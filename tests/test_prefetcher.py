@@ -0,0 +1,64 @@
+import asyncio
+
+from Backend.prefetcher import SnapshotPrefetcher
+
+
+def test_claim_stops_the_job_but_lets_its_render_finish() -> None:
+    async def scenario() -> None:
+        release = asyncio.Event()
+        started: list[str] = []
+        finished: list[str] = []
+
+        async def fetch(query: str) -> None:
+            started.append(query)
+            await release.wait()
+            finished.append(query)
+
+        prefetcher = SnapshotPrefetcher(fetch, str.lower, max_concurrent=1, min_interval=0)
+        prefetcher.schedule("next", ["a", "b", "c"])
+        await asyncio.sleep(0.01)
+        prefetcher.claim("next")
+        release.set()
+        await asyncio.sleep(0.01)
+        assert (started, finished) == (["a"], ["a"])
+        assert prefetcher.stats()["active_jobs"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_oldest_job_is_cancelled_past_max_jobs() -> None:
+    async def scenario() -> None:
+        cancelled: list[str] = []
+
+        async def fetch(query: str) -> None:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(query)
+                raise
+
+        prefetcher = SnapshotPrefetcher(fetch, str.lower, min_interval=0, max_jobs=1)
+        prefetcher.schedule("first", ["a"])
+        await asyncio.sleep(0.01)
+        prefetcher.schedule("second", ["b"])
+        await asyncio.sleep(0.01)
+        assert cancelled == ["a"]
+        assert prefetcher.counters["cancelled"] == 1
+        await prefetcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_hits_and_misses_are_counted() -> None:
+    async def scenario() -> None:
+        async def fetch(query: str) -> None:  # noqa: ARG001
+            return None
+
+        prefetcher = SnapshotPrefetcher(fetch, str.lower, min_interval=0)
+        prefetcher.schedule("next", ["a"])
+        await asyncio.sleep(0.01)
+        prefetcher.record_request("A")
+        prefetcher.record_request("b")
+        assert (prefetcher.counters["hits"], prefetcher.counters["misses"]) == (1, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,22 @@
+import pytest
+
+from Backend.query_normalization import normalize_query
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("Meaning of  'X'?", "meaning of x"),
+        ("  Black   HOLES ", "black holes"),
+        ("don\u2019t panic", "don't panic"),  # typographic apostrophe
+        ("ﬁnance", "finance"),  # NFKC folds the ligature
+        ("C++ vs. C#", "c vs c"),
+        ("", ""),
+    ],
+)
+def test_normalize_query(query: str, expected: str) -> None:
+    assert normalize_query(query) == expected
+
+
+def test_variants_share_a_key() -> None:
+    assert normalize_query("What is GDP?") == normalize_query("what is gdp")
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+from Backend.query_rules import QueryRuleEngine
+
+RULES_FILE = Path(__file__).parent.parent / "Backend" / "query_rules.json"
+
+
+@pytest.fixture(scope="module")
+def engine() -> QueryRuleEngine:
+    engine = QueryRuleEngine(RULES_FILE)
+    assert engine.last_error is None
+    return engine
+
+
+@pytest.mark.parametrize(
+    ("query", "rule"),
+    [
+        ("meaning of serendipity", "meaning_of"),
+        ("what is the meaning of carpe diem", "meaning_of"),
+        ("serendipity meaning", "meaning_of"),
+        ("ephemeral meaning in hindi", "meaning_of"),
+        ("what does ubiquitous mean", "what_does_x_mean"),
+        ("what is meant by entropy", "what_does_x_mean"),
+        ("define ephemeral", "define"),
+        ("definition of irony", "define"),
+        ("ephemeral dictionary definition", "define"),
+        ("ubiquitous definition in english", "define"),
+        ("synonyms for happy", "synonym_antonym"),
+        ("another word for big", "synonym_antonym"),
+        ("how to pronounce quinoa", "pronunciation"),
+        ("break a leg idiom", "idiom_expression"),
+        ("gen z slang", "idiom_expression"),
+        ("use ubiquitous in a sentence", "idiom_expression"),
+        ("etymology of salary", "idiom_expression"),
+        ("origin of the phrase bite the bullet", "idiom_expression"),
+    ],
+)
+def test_lexical_queries_match(engine: QueryRuleEngine, query: str, rule: str) -> None:
+    matched = engine.match(query)
+    assert matched is not None and matched.name == rule
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "python regular expression",
+        "regex for email expression",
+        "high definition",
+        "4k high definition tv",
+        "function definition",
+        "search phrase",
+        "facial expression",
+        "expression for area of a circle",
+        "meaningful work",
+        "meaning of the lyrics of bohemian rhapsody by queen",
+        "what does a high white blood cell count mean",
+        "how to redefine a variable",
+        "weather tomorrow",
+    ],
+)
+def test_other_queries_fall_through(engine: QueryRuleEngine, query: str) -> None:
+    assert engine.match(query) is None
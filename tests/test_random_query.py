@@ -0,0 +1,66 @@
+from datetime import datetime
+from types import ModuleType
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+
+def store_category(backend: ModuleType, category: str, count: int) -> None:
+    timestamp = datetime(2025, 1, 1)
+    with Session(backend.engine) as session:
+        for i in range(count):
+            session.add(backend.SearchEvent(query=f"q{i}", timestamp=timestamp, category=category))
+        session.commit()
+    backend.build_category_index()
+
+
+def pages(client: TestClient, n_pages: int, **params: str | int) -> list[list[str]]:
+    cursor = None
+    result = []
+    for _ in range(n_pages):
+        query: dict[str, str | int] = {"category": "Science", **params}
+        if cursor is not None:
+            query["cursor"] = cursor
+        response = client.get("/random-query", params=query)
+        result.append(response.json())
+        cursor = response.headers["X-Next-Cursor"]
+    return result
+
+
+def test_sequential_pages_cycle(backend: ModuleType, client: TestClient) -> None:
+    store_category(backend, "Science", 5)
+    assert pages(client, 4, limit=2) == [["q0", "q1"], ["q2", "q3"], ["q4"], ["q0", "q1"]]
+
+
+def test_exact_multiple_of_limit_wraps_without_an_empty_page(
+    backend: ModuleType, client: TestClient
+) -> None:
+    store_category(backend, "Science", 4)
+    assert pages(client, 3, limit=2) == [["q0", "q1"], ["q2", "q3"], ["q0", "q1"]]
+
+
+def test_cursor_past_the_end_starts_over(backend: ModuleType, client: TestClient) -> None:
+    store_category(backend, "Science", 3)
+    stale = backend._encode_cursor({"c": "Science", "a": 10_000})
+    params = {"category": "Science", "limit": 2, "cursor": stale}
+    assert client.get("/random-query", params=params).json() == ["q0", "q1"]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7])
+def test_random_order_covers_each_event_once_per_shuffle(
+    backend: ModuleType, client: TestClient, limit: int
+) -> None:
+    store_category(backend, "Science", 7)
+    n_pages = -(-7 // limit)
+    shuffle = [q for page in pages(client, n_pages, limit=limit, order="random") for q in page]
+    assert sorted(shuffle) == sorted(f"q{i}" for i in range(7))
+
+
+def test_random_shuffle_restarts_with_new_events(backend: ModuleType, client: TestClient) -> None:
+    store_category(backend, "Science", 3)
+    params: dict[str, str | int] = {"category": "Science", "limit": 3, "order": "random"}
+    cursor = client.get("/random-query", params=params).headers["X-Next-Cursor"]
+    store_category(backend, "Science", 2)
+    params.update(limit=5, cursor=cursor)
+    assert len(client.get("/random-query", params=params).json()) == 5
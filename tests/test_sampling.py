@@ -0,0 +1,33 @@
+import pytest
+
+from Backend.sampling import IndexPermutation
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 3, 10, 97, 1000, 4097])
+def test_permutation_is_a_bijection(n: int) -> None:
+    permutation = IndexPermutation(n, seed=12345)
+    assert sorted(permutation[i] for i in range(n)) == list(range(n))
+
+
+def test_same_seed_same_order_and_different_seed_differs() -> None:
+    first = [IndexPermutation(500, seed=1)[i] for i in range(500)]
+    assert first == [IndexPermutation(500, seed=1)[i] for i in range(500)]
+    assert first != [IndexPermutation(500, seed=2)[i] for i in range(500)]
+    assert first != list(range(500))
+
+
+def test_out_of_range_index_raises() -> None:
+    permutation = IndexPermutation(5, seed=0)
+    with pytest.raises(IndexError):
+        permutation[5]
+    with pytest.raises(ValueError):
+        IndexPermutation(-1, seed=0)
+
+
+def test_first_position_is_roughly_uniform() -> None:
+    n, trials = 8, 4000
+    hits = [0] * n
+    for seed in range(trials):
+        hits[IndexPermutation(n, seed)[0]] += 1
+    expected = trials / n
+    assert all(abs(h - expected) < 0.25 * expected for h in hits)
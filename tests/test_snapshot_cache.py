@@ -0,0 +1,44 @@
+import os
+import time
+from pathlib import Path
+
+from Backend.snapshot_cache import SnapshotCache
+
+PNG = b"p" * 1000
+
+
+def test_roundtrip_by_normalized_query(tmp_path: Path) -> None:
+    cache = SnapshotCache(tmp_path, max_bytes=10**6, ttl_seconds=3600)
+    stored = cache.put("Black Holes", PNG, b"jpeg", "<html>black holes</html>")
+    hit = cache.get("black   holes")
+    assert hit is not None and hit.key == stored.key
+    assert (hit.query, hit.read_screenshot(), hit.read_html()) == (
+        "Black Holes", PNG, "<html>black holes</html>"
+    )
+    assert cache.get_by_key("not-a-key") is None
+
+
+def test_expired_entries_are_misses_and_removed(tmp_path: Path) -> None:
+    cache = SnapshotCache(tmp_path, max_bytes=10**6, ttl_seconds=60)
+    stored = cache.put("old", PNG, b"jpeg", "")
+    old = time.time() - 120
+    os.utime(stored.screenshot_path, (old, old))
+    reopened = SnapshotCache(tmp_path, max_bytes=10**6, ttl_seconds=60)
+    assert reopened.get("old") is None
+    assert not stored.path.exists()
+
+
+def test_least_recently_used_is_evicted_and_order_survives_restart(tmp_path: Path) -> None:
+    cache = SnapshotCache(tmp_path, max_bytes=10**6, ttl_seconds=3600)
+    for query in ("a", "b", "c"):
+        entry = cache.put(query, PNG, b"jpeg", "")
+        then = time.time() - 100 + ord(query)
+        os.utime(entry.path / "meta.json", (then, then))
+    entry_size = cache.stats()["bytes"] // 3
+
+    reopened = SnapshotCache(tmp_path, max_bytes=10**6, ttl_seconds=3600)
+    assert reopened.get("a") is not None  # now the most recently used
+    reopened.max_bytes = 3 * entry_size
+    reopened.put("d", PNG, b"jpeg", "")
+    assert [q for q in "abcd" if reopened.get(q) is not None] == ["a", "c", "d"]
+    assert reopened.stats()["evictions"] == 1
@@ -0,0 +1,76 @@
+import asyncio
+from types import ModuleType
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.conftest import on_app_loop
+
+
+class FakeBrowser:
+    """Renders that only finish when released, recording which ones were cancelled."""
+
+    def __init__(self) -> None:
+        self.release = asyncio.Event()
+        self.started: list[str] = []
+        self.cancelled: list[str] = []
+
+    async def render(self, query: str) -> tuple[bytes, bytes, str]:
+        self.started.append(query)
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled.append(query)
+            raise
+        return b"png", b"jpeg", f"<html>{query}</html>"
+
+
+@pytest.fixture
+def browser(backend: ModuleType, monkeypatch: pytest.MonkeyPatch) -> FakeBrowser:
+    fake = FakeBrowser()
+    monkeypatch.setattr(backend.browser_pool, "render", fake.render)
+    return fake
+
+
+def test_render_is_cancelled_when_its_last_waiter_leaves(
+    backend: ModuleType, client: TestClient, browser: FakeBrowser
+) -> None:
+    async def scenario() -> None:
+        first = asyncio.ensure_future(backend.get_snapshot("black holes"))
+        second = asyncio.ensure_future(backend.get_snapshot("black holes"))
+        await asyncio.sleep(0.1)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        assert browser.started == ["black holes"] and browser.cancelled == []
+        second.cancel()
+        await asyncio.sleep(0.05)
+        assert browser.cancelled == ["black holes"]
+        assert backend.SNAPSHOT_RENDERS == {} and backend.SNAPSHOT_RENDER_WAITERS == {}
+
+    on_app_loop(client, scenario)
+
+
+def test_render_finishes_for_the_remaining_waiter(
+    backend: ModuleType, client: TestClient, browser: FakeBrowser
+) -> None:
+    async def scenario() -> str:
+        first = asyncio.ensure_future(backend.get_snapshot("black holes"))
+        second = asyncio.ensure_future(backend.get_snapshot("black holes"))
+        await asyncio.sleep(0.1)
+        first.cancel()
+        browser.release.set()
+        return str((await second).query)
+
+    assert on_app_loop(client, scenario) == "black holes"
+    assert browser.cancelled == []
+
+
+def test_exhausted_shuffle_cursor_determines_the_next_page(backend: ModuleType) -> None:
+    backend.category_index.extend(("Science", i, f"q{i}") for i in range(1, 11))
+    try:
+        _, cursor = backend._random_page("Science", 10, None, False)
+        first, _ = backend._random_page("Science", 4, cursor, False)
+        again, _ = backend._random_page("Science", 4, cursor, False)
+        assert first == again
+    finally:
+        backend.category_index.clear()
@@ -0,0 +1,36 @@
+import pytest
+
+from Backend.streaming_json import JSONStreamDecoder, JSONStreamError, MalformedItem
+
+
+def decode(chunks: list[str]) -> list[object]:
+    decoder = JSONStreamDecoder()
+    items = [item for chunk in chunks for item in decoder.feed(chunk)]
+    return items + decoder.close()
+
+
+def test_array_split_at_every_character() -> None:
+    text = '[{"q": "a, ]b"}, {"q": "c\\"d"}, 3]'
+    assert decode(list(text)) == [{"q": "a, ]b"}, {"q": 'c"d'}, 3]
+
+
+def test_ndjson_without_trailing_newline() -> None:
+    assert decode(['{"a": 1}\n{"a"', ': 2}']) == [{"a": 1}, {"a": 2}]
+
+
+def test_ndjson_malformed_line_is_reported_in_place() -> None:
+    items = decode(['{"a": 1}\nnot json\n{"a": 3}\n'])
+    assert items[0] == {"a": 1} and items[2] == {"a": 3}
+    assert isinstance(items[1], MalformedItem)
+
+
+def test_empty_input() -> None:
+    assert decode(["", "  \n"]) == []
+    assert decode(["[]"]) == []
+
+
+def test_unclosed_array_is_an_error() -> None:
+    decoder = JSONStreamDecoder()
+    assert decoder.feed('[{"a": 1}, {"a"') == [{"a": 1}]
+    with pytest.raises(JSONStreamError):
+        decoder.close()
@@ -0,0 +1,71 @@
+from types import ModuleType
+from typing import Any
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, func, select
+
+from tests.conftest import on_app_loop, write_activity
+
+
+def import_takeout(backend: ModuleType, client: TestClient) -> dict[str, Any]:
+    path = backend.MYACTIVITY_JSON_FILE
+    result: dict[str, Any] = on_app_loop(client, backend.import_takeout, path)
+    return result
+
+
+def stored_queries(backend: ModuleType) -> list[str]:
+    with Session(backend.engine) as session:
+        return sorted(session.exec(select(backend.SearchEvent.query)).all())
+
+
+def test_reimport_only_stores_what_is_new(backend: ModuleType, client: TestClient) -> None:
+    path = backend.MYACTIVITY_JSON_FILE
+    write_activity(
+        path, [("define b", "2025-01-02T00:00:00Z"), ("define a", "2025-01-01T00:00:00Z")]
+    )
+    first = import_takeout(backend, client)
+    assert (first["status"], first["stored"]) == ("imported", 2)
+    assert import_takeout(backend, client)["status"] == "unchanged"
+
+    # A newer export: one new search, the two already imported, and one older than the mark
+    write_activity(
+        path,
+        [
+            ("define c", "2025-01-03T00:00:00Z"),
+            ("define b", "2025-01-02T00:00:00Z"),
+            ("define a", "2025-01-01T00:00:00Z"),
+            ("define z", "2024-12-31T00:00:00Z"),
+        ],
+    )
+    second = import_takeout(backend, client)
+    assert (second["status"], second["stored"]) == ("imported", 1)
+    assert (second["duplicates"], second["older"]) == (1, 2)
+    assert stored_queries(backend) == ["define a", "define b", "define c"]
+
+
+def test_same_query_at_another_time_is_not_a_duplicate(
+    backend: ModuleType, client: TestClient
+) -> None:
+    write_activity(
+        backend.MYACTIVITY_JSON_FILE,
+        [
+            ("define a", "2025-01-02T00:00:00Z"),
+            ("define a", "2025-01-01T00:00:00Z"),
+            ("define a", "2025-01-01T00:00:00Z"),
+        ],
+    )
+    result = import_takeout(backend, client)
+    assert (result["stored"], result["duplicates"]) == (2, 1)
+    with Session(backend.engine) as session:
+        assert session.exec(select(func.count()).select_from(backend.SearchEvent)).one() == 2
+
+
+def test_partly_unclassified_import_keeps_the_mark(backend: ModuleType, client: TestClient) -> None:
+    write_activity(
+        backend.MYACTIVITY_JSON_FILE,
+        [("define a", "2025-01-02T00:00:00Z"), ("unknowable b", "2025-01-01T00:00:00Z")],
+    )
+    result = import_takeout(backend, client)
+    assert (result["status"], result["stored"], result["unclassified"]) == ("partial", 1, 1)
+    assert result["high_water"] is None
+    assert import_takeout(backend, client)["status"] != "unchanged"  # the file is read again
@@ -0,0 +1,44 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from Backend import processMyActivity
+from Backend.processMyActivity import iter_search_records
+
+
+def test_only_searches_are_yielded_in_file_order(tmp_path: Path) -> None:
+    path = tmp_path / "MyActivity.json"
+    entries = [
+        {"title": "Searched for black holes", "time": "2025-01-02T00:00:00Z"},
+        {"title": "Visited https://example.com", "time": "2025-01-01T12:00:00Z"},
+        "not an entry",
+        {"title": "Searched for café été ", "time": "2025-01-01T00:00:00Z"},
+    ]
+    path.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+    assert list(iter_search_records(path)) == [
+        {"query": "black holes", "timestamp": "2025-01-02T00:00:00Z"},
+        {"query": "café été", "timestamp": "2025-01-01T00:00:00Z"},
+    ]
+
+
+def test_entries_spanning_reads_and_progress(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(processMyActivity, "READ_CHUNK_CHARS", 7)
+    path = tmp_path / "MyActivity.json"
+    entries = [{"title": f"Searched for query number {i}", "time": f"t{i}"} for i in range(50)]
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    reads: list[int] = []
+    records = list(iter_search_records(path, on_read=reads.append))
+    assert [r["query"] for r in records] == [f"query number {i}" for i in range(50)]
+    assert reads == sorted(reads) and reads[-1] == path.stat().st_size
+
+
+def test_truncated_export_raises_after_the_complete_entries(tmp_path: Path) -> None:
+    path = tmp_path / "MyActivity.json"
+    path.write_text('[{"title": "Searched for a", "time": "t"}, {"title": "Sear', encoding="utf-8")
+    records = iter_search_records(path)
+    assert next(records)["query"] == "a"
+    with pytest.raises(ValueError):
+        next(records)
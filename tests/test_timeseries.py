@@ -0,0 +1,68 @@
+from datetime import datetime
+from types import ModuleType
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+
+def store_events(backend: ModuleType, timestamps: list[str]) -> None:
+    with Session(backend.engine) as session:
+        for ts in timestamps:
+            timestamp = datetime.fromisoformat(ts)
+            session.add(backend.SearchEvent(query="q", timestamp=timestamp, category="Science"))
+        session.commit()
+    backend.rebuild_rollups()
+
+
+def test_repeated_hour_at_dst_end_is_two_buckets(backend: ModuleType, client: TestClient) -> None:
+    # Dublin falls back from +01:00 to +00:00 at 01:00 UTC on 2025-10-26: local 01:00 happens twice
+    store_events(backend, ["2025-10-26 00:30:00", "2025-10-26 01:30:00", "2025-10-26 01:45:00"])
+    body = client.get(
+        "/analytics/timeseries",
+        params={
+            "start": "2025-10-26T00:00:00Z",
+            "end": "2025-10-26T03:00:00Z",
+            "granularity": "hour",
+            "tz": "Europe/Dublin",
+        },
+    ).json()
+    assert body["granularity"] == "hour"
+    assert [(b["start"], b["total"]) for b in body["buckets"]] == [
+        ("2025-10-26T01:00:00+01:00", 1),
+        ("2025-10-26T01:00:00+00:00", 2),
+        ("2025-10-26T02:00:00+00:00", 0),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("start", "requested", "max_points", "expected"),
+    [
+        ("2025-10-01T00:00:00Z", "hour", 366, "hour"),
+        ("2025-01-01T00:00:00Z", "hour", 366, "day"),
+        ("2025-01-01T00:00:00Z", "hour", 60, "week"),
+        ("2000-01-01T00:00:00Z", "hour", 366, "month"),
+        ("2000-01-01T00:00:00Z", "day", 24, "month"),
+    ],
+)
+def test_long_ranges_use_a_coarser_granularity(
+    backend: ModuleType,
+    client: TestClient,
+    start: str,
+    requested: str,
+    max_points: int,
+    expected: str,
+) -> None:
+    store_events(backend, ["2025-10-01 12:00:00"])
+    body = client.get(
+        "/analytics/timeseries",
+        params={
+            "start": start,
+            "end": "2025-10-02T00:00:00Z",
+            "granularity": requested,
+            "max_points": max_points,
+        },
+    ).json()
+    assert (body["requested_granularity"], body["granularity"]) == (requested, expected)
+    assert len(body["buckets"]) <= max_points
+    assert sum(b["total"] for b in body["buckets"]) == 1